@@ -1,7 +1,8 @@
+from bisect import bisect_right
 from datetime import date, timedelta
-from decimal import Decimal
 
-from utils import parse_date
+import columnar
+from utils import cents_to_decimal
 
 
 def daterange_days(start, end):
@@ -11,6 +12,38 @@ def daterange_days(start, end):
         cur += timedelta(days=1)
 
 
+PERIODS = ["this month", "last month", "today", "this week", "this year", "last year"]
+
+
+def period_range(period, today):
+    if period == "today":
+        return today, today
+    if period == "this week":
+        start = today - timedelta(days=today.weekday())
+        return start, start + timedelta(days=6)
+    if period == "this month":
+        start = today.replace(day=1)
+        if start.month == 12:
+            nxt = start.replace(year=start.year + 1, month=1, day=1)
+        else:
+            nxt = start.replace(month=start.month + 1, day=1)
+        return start, nxt - timedelta(days=1)
+    if period == "last month":
+        end = today.replace(day=1) - timedelta(days=1)
+        return end.replace(day=1), end
+    if period == "this year":
+        return today.replace(month=1, day=1), today.replace(month=12, day=31)
+    if period == "last year":
+        return today.replace(year=today.year - 1, month=1, day=1), today.replace(year=today.year - 1, month=12, day=31)
+    return today, today
+
+
+def granularity_options(range_days):
+    if range_days < 60:
+        return ["day", "week_monday", "week_rolling", "month"]
+    return ["week_monday", "week_rolling", "month"]
+
+
 def bucket_ranges(start, end, mode):
     buckets = []
     if mode == "day":
@@ -61,45 +94,85 @@ def label_for_range(start, end, mode):
     return start.strftime("%b %Y")
 
 
-def group_key(row, grouping):
+def bucket_locator(buckets, mode):
+    if not buckets:
+        return None
+    first = buckets[0][0]
+    first_ordinal = first.toordinal()
+    if mode == "day":
+        return lambda d: d.toordinal() - first_ordinal
+    if mode == "week_rolling":
+        return lambda d: (d.toordinal() - first_ordinal) // 7
+    if mode == "week_monday":
+        monday_ordinal = first_ordinal - first.weekday()
+        return lambda d: (d.toordinal() - monday_ordinal) // 7
+    if mode == "month":
+        first_month = first.year * 12 + first.month
+        return lambda d: d.year * 12 + d.month - first_month
+    starts = [b[0] for b in buckets]
+    return lambda d: bisect_right(starts, d) - 1
+
+
+def group_key(line, grouping):
     if grouping == "store":
-        return row.get("store", "Unknown") or "Unknown"
+        return line.store or "Unknown"
     if grouping == "person":
-        return row.get("person", "Unknown") or "Unknown"
+        return line.person or "Unknown"
     if grouping == "category":
-        return row.get("category", "Unknown") or "Unknown"
+        return line.category or "Unknown"
     if grouping == "subcategory":
-        cat = row.get("category", "Unknown") or "Unknown"
-        sub = row.get("sub_category", "Unknown") or "Unknown"
+        cat = line.category or "Unknown"
+        sub = line.sub_category or "Unknown"
         return f"{cat} > {sub}"
     return "Unknown"
 
 
-def aggregate_by_bucket(rows, start, end, mode, date_formats):
-    buckets = bucket_ranges(start, end, mode)
-    totals = [Decimal("0.00") for _ in buckets]
-
-    for row in rows:
-        d = parse_date(row.get("date", ""), date_formats)
-        if not d or d < start or d > end:
-            continue
-        amount = Decimal(str(row.get("amount", "0") or "0").replace(",", "."))
-        for idx, (b_start, b_end) in enumerate(buckets):
-            if b_start <= d <= b_end:
-                totals[idx] += amount
-                break
+def _use_columnar(lines):
+    return len(lines) >= columnar.MIN_ROWS and columnar.available()
+
 
+def _bucket_result(buckets, mode, totals):
     labels = [label_for_range(b[0], b[1], mode) for b in buckets]
-    return buckets, labels, totals
-
-
-def aggregate_pie(rows, start, end, grouping, date_formats):
-    totals = {}
-    for row in rows:
-        d = parse_date(row.get("date", ""), date_formats)
-        if not d or d < start or d > end:
-            continue
-        key = group_key(row, grouping)
-        amount = Decimal(str(row.get("amount", "0") or "0").replace(",", "."))
-        totals[key] = totals.get(key, Decimal("0.00")) + amount
-    return totals
+    return buckets, labels, [cents_to_decimal(t) for t in totals]
+
+
+def aggregate_by_bucket(lines, start, end, mode):
+    buckets = bucket_ranges(start, end, mode)
+    if _use_columnar(lines):
+        totals = columnar.bucket_totals(columnar.columns_for(lines), buckets, start, end)
+    else:
+        totals = [0 for _ in buckets]
+        locate = bucket_locator(buckets, mode)
+        if locate is not None:
+            for line in lines:
+                d = line.date
+                if not d or d < start or d > end:
+                    continue
+                totals[locate(d)] += line.amount_cents
+    return _bucket_result(buckets, mode, totals)
+
+
+def aggregate_by_bucket_in(backend, start, end, mode, person=None):
+    buckets = bucket_ranges(start, end, mode)
+    return _bucket_result(buckets, mode, backend.range_totals(buckets, person))
+
+
+def aggregate_pie(lines, start, end, grouping):
+    if _use_columnar(lines):
+        totals = columnar.group_totals(
+            columnar.columns_for(lines), start, end, grouping, lambda line: group_key(line, grouping)
+        )
+    else:
+        totals = {}
+        for line in lines:
+            d = line.date
+            if not d or d < start or d > end:
+                continue
+            key = group_key(line, grouping)
+            totals[key] = totals.get(key, 0) + line.amount_cents
+    return {key: cents_to_decimal(cents) for key, cents in totals.items()}
+
+
+def aggregate_pie_in(backend, start, end, grouping, person=None):
+    totals = backend.group_totals(start, end, grouping, person)
+    return {key: cents_to_decimal(cents) for key, cents in totals.items()}
@@ -1,29 +1,17 @@
 import os
 import tkinter as tk
-from tkinter import ttk
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import messagebox, ttk
 
-from data_store import ensure_expense_file, load_json, save_json
+import instrumentation
+from data_store import DEFAULT_DATA, ensure_expense_file, load_json, open_backend, save_json, set_ledger
 from expenses_mixin import ExpensesMixin
 from history_mixin import HistoryMixin
 from management_mixin import ManagementMixin
 
 
-DEFAULT_DATA = {
-    "people": ["Tinka", "Aljaz"],
-    "categories": {
-        "Groceries": ["Food", "Drinks"],
-        "Cosmetics": ["Makeup", "Skincare"],
-        "Pharmaceuticals": ["Medicine"],
-    },
-    "stores": {
-        "DM": {"category": "Cosmetics", "sub": "Makeup"},
-        "Spar": {"category": "Groceries", "sub": "Food"},
-    },
-    "settings": {
-        "currency": "EUR",
-        "date_format": "%d.%m.%Y",
-    },
-}
+FUTURE_POLL_MS = 15
+REFRESH_FRAME_MS = 16
 
 
 class ExpenseTracker(ExpensesMixin, HistoryMixin, ManagementMixin, tk.Tk):
@@ -38,13 +26,114 @@ class ExpenseTracker(ExpensesMixin, HistoryMixin, ManagementMixin, tk.Tk):
         self.categories = load_json("categories", DEFAULT_DATA)
         self.stores = load_json("stores", DEFAULT_DATA)
         self.settings = load_json("settings", DEFAULT_DATA)
+        instrumentation.configure(self.settings)
 
         self.breakdown = []
         self.filtered_records = []
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ledger")
+        self.ledger_ready = False
+        self.ledger_future = None
+        self.ledger_waiters = []
+        self.load_breakdown = None
+        self.history_future = None
+        self.history_generation = 0
+        self.history_built = False
+        self.dirty_parts = set()
+        self.refresh_job = None
 
-        ensure_expense_file()
         self.create_menu()
         self.create_tabs()
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.after_idle(self._start_ledger_load)
+
+    def _start_ledger_load(self):
+        if self.ledger_future is None:
+            self.load_breakdown = instrumentation.begin("load")
+            self.ledger_future = self.run_in_background(
+                self._load_ledger,
+                self.load_breakdown,
+                on_done=self._on_ledger_loaded,
+                on_error=self._on_ledger_failed,
+            )
+
+    def _load_ledger(self, breakdown):
+        with instrumentation.recording(breakdown):
+            with instrumentation.timer("ensure"):
+                ensure_expense_file()
+            backend = open_backend(
+                self.settings.get("storage_backend", "csv"),
+                self.settings.get("date_format", "%d.%m.%Y"),
+            )
+            with instrumentation.timer("parse"):
+                instrumentation.count("rows_loaded", backend.line_count())
+        return backend
+
+    def _on_ledger_loaded(self, backend):
+        if self.ledger_ready:
+            return
+        set_ledger(backend)
+        self.ledger_ready = True
+        self.report_timings(self.load_breakdown)
+        waiters, self.ledger_waiters = self.ledger_waiters, []
+        for callback in waiters:
+            callback()
+        self.refresh_history()
+
+    def _on_ledger_failed(self, error):
+        future = self.ledger_future
+        if self.ledger_ready or future is None or not future.done() or future.exception() is not error:
+            return
+        self.ledger_future = None
+        self.ledger_waiters = []
+        if self.history_built:
+            self.history_summary.config(text="Could not load expenses.")
+        self.show_background_error(error, "Could not load expenses")
+
+    def when_ledger_loaded(self, callback):
+        if self.ledger_ready:
+            callback()
+            return
+        self.ledger_waiters.append(callback)
+        self.set_status("Loading expenses\u2026")
+        self._start_ledger_load()
+
+    def run_in_background(self, fn, *args, on_done, on_error=None):
+        future = self.executor.submit(fn, *args)
+        self.after(FUTURE_POLL_MS, self._poll_future, future, on_done, on_error or self.show_background_error)
+        return future
+
+    def _poll_future(self, future, on_done, on_error):
+        if not future.done():
+            self.after(FUTURE_POLL_MS, self._poll_future, future, on_done, on_error)
+            return
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            on_error(error)
+        else:
+            on_done(future.result())
+
+    def show_background_error(self, error, title="Error"):
+        self.set_status(f"{title}: {error}")
+        messagebox.showerror(title, str(error))
+
+    def schedule_refresh(self, *parts):
+        self.dirty_parts.update(parts)
+        if self.refresh_job is None:
+            self.refresh_job = self.after(REFRESH_FRAME_MS, self._flush_refresh)
+
+    def _flush_refresh(self):
+        self.refresh_job = None
+        dirty, self.dirty_parts = self.dirty_parts, set()
+        if "table" in dirty:
+            self.refresh_history()
+        elif dirty:
+            self.redraw_analytics(dirty)
+
+    def on_close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.destroy()
 
     def create_menu(self):
         menubar = tk.Menu(self)
@@ -57,6 +146,10 @@ class ExpenseTracker(ExpensesMixin, HistoryMixin, ManagementMixin, tk.Tk):
             )
         menubar.add_cascade(label="Settings", menu=settings_menu)
 
+        data_menu = tk.Menu(menubar, tearoff=0)
+        data_menu.add_command(label="Import expenses CSV\u2026", command=self.import_expenses_csv)
+        menubar.add_cascade(label="Data", menu=data_menu)
+
         self.config(menu=menubar)
 
     def set_currency(self, cur):
@@ -64,10 +157,11 @@ class ExpenseTracker(ExpensesMixin, HistoryMixin, ManagementMixin, tk.Tk):
         save_json("settings", self.settings)
         self.currency_label.config(text=cur)
         self.tree.heading("amt", text=f"Amount ({cur})")
-        self.history_tree.heading("amount", text=f"Amount ({cur})")
-        self.history_tree.heading("total", text=f"Expense total ({cur})")
         self.update_remainder()
-        self.refresh_history()
+        if self.history_built:
+            self.history_tree.heading("amount", text=f"Amount ({cur})")
+            self.history_tree.heading("total", text=f"Expense total ({cur})")
+            self.refresh_history(keep_position=True)
 
     def create_tabs(self):
         self.tabs = ttk.Notebook(self)
@@ -81,16 +175,34 @@ class ExpenseTracker(ExpensesMixin, HistoryMixin, ManagementMixin, tk.Tk):
         self.tabs.add(self.tab_history, text="History")
         self.tabs.add(self.tab_manage, text="Management")
 
+        self.tab_builders = {
+            str(self.tab_history): self.build_history_tab,
+            str(self.tab_manage): self.build_manage_tab,
+        }
         self.build_expense_tab()
-        self.build_history_tab()
-        self.build_manage_tab()
+        self.tabs.bind("<<NotebookTabChanged>>", self.on_tab_changed)
 
         self.status_var = tk.StringVar(value="Ready")
         ttk.Label(self, textvariable=self.status_var, anchor="w").pack(fill="x", padx=8, pady=(0, 8))
 
+    def on_tab_changed(self, _event=None):
+        build = self.tab_builders.pop(self.tabs.select(), None)
+        if build is not None:
+            build()
+
+    def make_date_entry(self, parent, **options):
+        from tkcalendar import DateEntry
+
+        return DateEntry(parent, date_pattern="dd.mm.yyyy", **options)
+
     def set_status(self, text):
         self.status_var.set(text)
 
+    def report_timings(self, breakdown):
+        breakdown = instrumentation.finish(breakdown)
+        if breakdown is not None:
+            self.set_status(instrumentation.format_breakdown(breakdown))
+
     def set_window_icon(self):
         icon_path = os.path.join("assets", "app_icon.ico")
         if not os.path.exists(icon_path):
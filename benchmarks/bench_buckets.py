@@ -0,0 +1,111 @@
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+import analytics
+import columnar
+from data_store import ExpenseLine
+
+
+MODES = ["day", "week_monday", "week_rolling", "month"]
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def make_lines(count, start, end, seed=7):
+    rnd = random.Random(seed)
+    span = (end - start).days + 60
+    lines = []
+    for i in range(count):
+        d = start - timedelta(days=30) + timedelta(days=rnd.randrange(span))
+        lines.append(
+            ExpenseLine(
+                d,
+                d.strftime("%d.%m.%Y"),
+                "Tinka" if i % 2 else "Aljaz",
+                "Spar",
+                1000,
+                "Groceries",
+                "Food",
+                rnd.randrange(1, 10_000),
+                f"{i // 3:08x}",
+                "",
+            )
+        )
+    return lines
+
+
+def legacy_bucket_totals(lines, start, end, mode):
+    buckets = analytics.bucket_ranges(start, end, mode)
+    totals = [0 for _ in buckets]
+    for line in lines:
+        d = line.date
+        if not d or d < start or d > end:
+            continue
+        for idx, (b_start, b_end) in enumerate(buckets):
+            if b_start <= d <= b_end:
+                totals[idx] += line.amount_cents
+                break
+    return totals
+
+
+def indexed_bucket_totals(lines, start, end, mode):
+    columnar.available()
+    numpy_module = columnar.np
+    columnar.np = None
+    try:
+        _buckets, _labels, totals = analytics.aggregate_by_bucket(lines, start, end, mode)
+    finally:
+        columnar.np = numpy_module
+    return [int(t * 100) for t in totals]
+
+
+def columnar_bucket_totals(lines, start, end, mode):
+    buckets = analytics.bucket_ranges(start, end, mode)
+    return columnar.bucket_totals(columnar.ExpenseColumns(lines), buckets, start, end)
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - started, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare bucket assignment strategies.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument(
+        "--legacy-limit", type=int, help="skip the linear scan above this size (by default it runs at every size)"
+    )
+    args = parser.parse_args(argv)
+
+    start, end = date(2025, 1, 1), date(2025, 12, 31)
+    print(f"{'rows':>9} {'mode':<13} {'buckets':>7} {'legacy s':>9} {'bisect s':>9} {'numpy s':>9} {'speedup':>8}")
+    for size in args.sizes:
+        lines = make_lines(size, start, end)
+        for mode in MODES:
+            bucket_count = len(analytics.bucket_ranges(start, end, mode))
+            new_time, new_totals = timed(indexed_bucket_totals, lines, start, end, mode)
+            legacy_time = None
+            if args.legacy_limit is None or size <= args.legacy_limit:
+                legacy_time, legacy_totals = timed(legacy_bucket_totals, lines, start, end, mode)
+                assert legacy_totals == new_totals, mode
+            numpy_time = None
+            if columnar.available():
+                numpy_time, numpy_totals = timed(columnar_bucket_totals, lines, start, end, mode)
+                assert numpy_totals == new_totals, mode
+            print(
+                f"{size:>9} {mode:<13} {bucket_count:>7} "
+                f"{_fmt(legacy_time):>9} {new_time:>9.3f} {_fmt(numpy_time):>9} "
+                f"{_fmt(legacy_time / new_time if legacy_time else None, '{:.1f}x'):>8}"
+            )
+
+
+def _fmt(value, pattern="{:.3f}"):
+    if value is None:
+        return "-"
+    return pattern.format(value)
+
+
+if __name__ == "__main__":
+    main()
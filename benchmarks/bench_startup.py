@@ -0,0 +1,92 @@
+import argparse
+import os
+import subprocess
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = """
+import time
+started = time.perf_counter()
+import {module}
+print(time.perf_counter() - started)
+"""
+
+STARTUP_SNIPPET = """
+import time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+try:
+    window = app.ExpenseTracker()
+except app.tk.TclError as exc:
+    print("skip", exc)
+    raise SystemExit(0)
+window.update()
+shown = time.perf_counter()
+window.on_close()
+print(imported - started, shown - started)
+"""
+
+BUDGETS_MS = {
+    "import app": 150,
+    "import report": 60,
+    "app window shown": 600,
+}
+
+
+def run_snippet(snippet, data_dir):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    out = subprocess.run(
+        [sys.executable, "-c", snippet],
+        cwd=data_dir,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.split()
+    if out and out[0] == "skip":
+        return None
+    return [float(value) for value in out]
+
+
+def best_of(repeat, snippet, data_dir):
+    best = None
+    for _ in range(repeat):
+        timings = run_snippet(snippet, data_dir)
+        if timings is None:
+            return None
+        best = timings if best is None else [min(a, b) for a, b in zip(best, timings)]
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Track import and window startup time against budgets.")
+    parser.add_argument("--data-dir", default=".", help="directory with data/ and expenses.csv to start in")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    results = {}
+    for module in ("app", "report"):
+        timings = best_of(args.repeat, IMPORT_SNIPPET.format(module=module), args.data_dir)
+        results[f"import {module}"] = timings[0]
+    timings = best_of(args.repeat, STARTUP_SNIPPET, args.data_dir)
+    results["app window shown"] = timings[1] if timings else None
+
+    over_budget = False
+    print(f"{'measure':<18} {'best ms':>9} {'budget ms':>10}")
+    for name, seconds in results.items():
+        budget = BUDGETS_MS[name]
+        if seconds is None:
+            print(f"{name:<18} {'-':>9} {budget:>10}  (no display)")
+            continue
+        ms = seconds * 1000
+        flag = "" if ms <= budget else "  OVER BUDGET"
+        over_budget = over_budget or bool(flag)
+        print(f"{name:<18} {ms:>9.1f} {budget:>10}{flag}")
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+import argparse
+import csv
+import os
+import tempfile
+import time
+from datetime import date
+
+from benchmarks.bench_buckets import make_lines
+from data_store import CSV_HEADERS, Ledger, atomic_write
+
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def plain_rewrite(path, lines):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_HEADERS)
+        writer.writeheader()
+        writer.writerows(line.as_row() for line in lines)
+
+
+def atomic_rewrite(path, lines):
+    def write(f):
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADERS)
+        writer.writerows(line.as_values() for line in lines)
+
+    atomic_write(path, write, newline="")
+
+
+def ledger_rewrite(path, lines):
+    Ledger(path).replace_all(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure ledger rewrite throughput.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    strategies = [
+        ("plain DictWriter", plain_rewrite),
+        ("atomic + fsync", atomic_rewrite),
+        ("Ledger.replace_all", ledger_rewrite),
+    ]
+    print(f"{'rows':>9} {'strategy':<20} {'best s':>8} {'MB/s':>8} {'rows/s':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "expenses.csv")
+        for size in args.sizes:
+            lines = make_lines(size, date(2025, 1, 1), date(2025, 12, 31))
+            for name, fn in strategies:
+                best = None
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    fn(path, lines)
+                    elapsed = time.perf_counter() - started
+                    best = elapsed if best is None else min(best, elapsed)
+                megabytes = os.path.getsize(path) / (1024 * 1024)
+                print(f"{size:>9} {name:<20} {best:>8.3f} {megabytes / best:>8.1f} {size / best:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
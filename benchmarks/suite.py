@@ -0,0 +1,159 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+
+from analytics import aggregate_by_bucket, aggregate_by_bucket_in, aggregate_pie, aggregate_pie_in
+from benchmarks.synthetic import write_ledger
+from csv_scan import scan
+from data_store import Ledger, ensure_expense_file
+from ledger_index import remove_index
+
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+REPORT_START = date(2024, 1, 1)
+REPORT_END = date(2024, 12, 31)
+REPORT_PERSON = "Tinka"
+
+
+def build_cases(workdir, size, seed):
+    ledger_path = write_ledger(os.path.join(workdir, "expenses.csv"), size, seed)
+    legacy_path = write_ledger(os.path.join(workdir, "legacy.csv"), size, seed, legacy=True)
+    migrate_path = os.path.join(workdir, "migrate.csv")
+    out_path = os.path.join(workdir, "out.csv")
+
+    ledger = Ledger(ledger_path)
+    ledger.lines()
+    year_lines = ledger.query(REPORT_START, REPORT_END)
+
+    def fresh_legacy():
+        shutil.copyfile(legacy_path, migrate_path)
+        if os.path.exists(migrate_path + ".schema"):
+            os.remove(migrate_path + ".schema")
+
+    def refresh():
+        lines = ledger.query(REPORT_START, REPORT_END, REPORT_PERSON)
+        return sum(line.amount_cents for line in lines)
+
+    def aggregate_in():
+        aggregate_by_bucket_in(ledger, REPORT_START, REPORT_END, "week_monday", REPORT_PERSON)
+        aggregate_pie_in(ledger, REPORT_START, REPORT_END, "subcategory", REPORT_PERSON)
+
+    return [
+        ("read_expenses", None, lambda: Ledger(ledger_path).lines()),
+        ("read_expenses_unindexed", lambda: remove_index(ledger_path), lambda: Ledger(ledger_path).lines()),
+        ("refresh_history", None, refresh),
+        ("scan_report", None, lambda: scan(ledger_path, REPORT_START, REPORT_END, REPORT_PERSON)),
+        ("aggregate_by_bucket", None, lambda: aggregate_by_bucket(year_lines, REPORT_START, REPORT_END, "week_monday")),
+        ("aggregate_pie", None, lambda: aggregate_pie(year_lines, REPORT_START, REPORT_END, "subcategory")),
+        ("aggregate_in_backend", None, aggregate_in),
+        ("write_expenses", None, lambda: Ledger(out_path).replace_all(ledger.lines())),
+        ("ensure_expense_file_migrate", fresh_legacy, lambda: ensure_expense_file(migrate_path)),
+        ("ensure_expense_file_current", None, lambda: ensure_expense_file(ledger_path)),
+    ]
+
+
+def measure(setup, fn, repeat, memory):
+    best = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    peak = None
+    if memory:
+        if setup is not None:
+            setup()
+        tracemalloc.start()
+        try:
+            fn()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {"seconds": best, "peak_bytes": peak}
+
+
+def run(sizes, repeat, seed, memory, only=None):
+    results = {}
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as workdir:
+            results[str(size)] = {}
+            for name, setup, fn in build_cases(workdir, size, seed):
+                if only and name not in only:
+                    continue
+                result = measure(setup, fn, repeat, memory)
+                results[str(size)][name] = result
+                peak = result["peak_bytes"]
+                print(
+                    f"{size:>9} {name:<28} {result['seconds']:>9.4f} s"
+                    f"{'' if peak is None else f' {peak / (1024 * 1024):>9.1f} MiB'}",
+                    file=sys.stderr,
+                )
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": seed,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline, current, tolerance):
+    regressions = []
+    print(f"{'rows':>9} {'benchmark':<28} {'base s':>9} {'now s':>9} {'ratio':>7} {'peak ratio':>10}")
+    for size, cases in current["results"].items():
+        for name, now in cases.items():
+            base = baseline["results"].get(size, {}).get(name)
+            if base is None:
+                continue
+            ratio = now["seconds"] / base["seconds"] if base["seconds"] else 1.0
+            peak_ratio = None
+            if now["peak_bytes"] is not None and base["peak_bytes"]:
+                peak_ratio = now["peak_bytes"] / base["peak_bytes"]
+            flag = ""
+            if ratio > tolerance or (peak_ratio is not None and peak_ratio > tolerance):
+                flag = "  REGRESSION"
+                regressions.append((size, name))
+            print(
+                f"{size:>9} {name:<28} {base['seconds']:>9.4f} {now['seconds']:>9.4f} {ratio:>6.2f}x "
+                f"{'-' if peak_ratio is None else f'{peak_ratio:.2f}x':>10}{flag}"
+            )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time and memory-profile the ledger hot paths on synthetic data.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--only", nargs="+", help="run only these benchmarks")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare against a previous JSON result")
+    parser.add_argument("--tolerance", type=float, default=1.2, help="ratio above which a result is a regression")
+    args = parser.parse_args(argv)
+
+    current = run(args.sizes, args.repeat, args.seed, not args.no_memory, args.only)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(baseline, current, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+import argparse
+import csv
+import random
+from datetime import date, timedelta
+
+from data_store import CSV_HEADERS
+
+
+PEOPLE = ["Tinka", "Aljaz", "Maja", "Luka"]
+STORES = {
+    "Spar": ("Groceries", ["Food", "Drinks"]),
+    "Mercator": ("Groceries", ["Food", "Drinks", "Household"]),
+    "Hofer": ("Groceries", ["Food", "Drinks"]),
+    "DM": ("Cosmetics", ["Makeup", "Skincare"]),
+    "Muller": ("Cosmetics", ["Makeup", "Skincare", "Household"]),
+    "Lekarna": ("Pharmaceuticals", ["Medicine"]),
+    "Petrol": ("Transport", ["Fuel", "Drinks"]),
+    "Ikea": ("Home", ["Furniture", "Household"]),
+}
+STORE_WEIGHTS = [30, 20, 15, 10, 6, 5, 9, 5]
+LINE_COUNT_WEIGHTS = [55, 25, 12, 5, 3]
+DATE_FORMAT_WEIGHTS = [("%d.%m.%Y", 85), ("%Y-%m-%d", 12), ("%m/%d/%Y", 3)]
+LEGACY_HEADERS = ["date", "person", "store", "total", "category", "sub_category", "amount"]
+DEFAULT_START = date(2020, 1, 1)
+DEFAULT_DAYS = 6 * 365
+
+
+def iter_rows(line_count, seed=1, start=DEFAULT_START, days=DEFAULT_DAYS):
+    rnd = random.Random(seed)
+    stores = list(STORES)
+    formats = [fmt for fmt, _ in DATE_FORMAT_WEIGHTS]
+    format_weights = [weight for _, weight in DATE_FORMAT_WEIGHTS]
+    emitted = 0
+    expense_no = 0
+    while emitted < line_count:
+        day = start + timedelta(days=int(days * rnd.random() ** 0.7))
+        date_text = day.strftime(rnd.choices(formats, format_weights)[0])
+        person = PEOPLE[expense_no % len(PEOPLE)] if rnd.random() < 0.8 else rnd.choice(PEOPLE)
+        store = rnd.choices(stores, STORE_WEIGHTS)[0]
+        category, subs = STORES[store]
+        count = min(rnd.choices(range(1, len(LINE_COUNT_WEIGHTS) + 1), LINE_COUNT_WEIGHTS)[0], line_count - emitted)
+        amounts = [rnd.randrange(49, 12_000) for _ in range(count)]
+        total = sum(amounts)
+        expense_id = f"{expense_no:08x}"
+        created_at = f"{day.isoformat()}T{rnd.randrange(7, 22):02d}:{rnd.randrange(60):02d}:00"
+        for cents in amounts:
+            yield [
+                date_text,
+                person,
+                store,
+                f"{total // 100}.{total % 100:02d}",
+                category,
+                rnd.choice(subs),
+                f"{cents // 100}.{cents % 100:02d}",
+                expense_id,
+                created_at,
+            ]
+        emitted += count
+        expense_no += 1
+
+
+def write_ledger(path, line_count, seed=1, legacy=False):
+    headers = LEGACY_HEADERS if legacy else CSV_HEADERS
+    keep = [CSV_HEADERS.index(h) for h in headers]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        writer.writerows([values[i] for i in keep] for values in iter_rows(line_count, seed))
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a deterministic synthetic expenses.csv.")
+    parser.add_argument("path")
+    parser.add_argument("--lines", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--legacy", action="store_true", help="write the pre-migration header without ids")
+    args = parser.parse_args(argv)
+    write_ledger(args.path, args.lines, args.seed, args.legacy)
+    print(f"Wrote {args.lines} lines to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
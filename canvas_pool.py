@@ -0,0 +1,43 @@
+import instrumentation
+
+
+class CanvasPool:
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.pools = {}
+        self.used = {}
+        self.drawn = {}
+
+    def begin(self):
+        self.used = {}
+
+    def draw(self, role, kind, coords, **options):
+        options["state"] = "normal"
+        pool = self.pools.setdefault(role, [])
+        idx = self.used.get(role, 0)
+        self.used[role] = idx + 1
+        if idx < len(pool):
+            item = pool[idx]
+            old_coords, old_options = self.drawn[item]
+            if old_coords != coords:
+                self.canvas.coords(item, *coords)
+                instrumentation.count("tcl_ops")
+            changed = {key: value for key, value in options.items() if old_options.get(key) != value}
+            if changed:
+                self.canvas.itemconfigure(item, **changed)
+                instrumentation.count("tcl_ops")
+        else:
+            item = getattr(self.canvas, f"create_{kind}")(*coords, tags=role, **options)
+            pool.append(item)
+            instrumentation.count("tcl_ops")
+        self.drawn[item] = (coords, options)
+        return item
+
+    def finish(self):
+        for role, pool in self.pools.items():
+            for item in pool[self.used.get(role, 0):]:
+                coords, options = self.drawn[item]
+                if options["state"] != "hidden":
+                    self.canvas.itemconfigure(item, state="hidden")
+                    instrumentation.count("tcl_ops")
+                    self.drawn[item] = (coords, dict(options, state="hidden"))
@@ -0,0 +1,76 @@
+MIN_ROWS = 2000
+
+np = None
+_numpy_probed = False
+_cache = None
+
+
+def available():
+    global np, _numpy_probed
+    if not _numpy_probed:
+        _numpy_probed = True
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        np = numpy
+    return np is not None
+
+
+class ExpenseColumns:
+    def __init__(self, lines):
+        self.lines = lines
+        count = len(lines)
+        self.ordinals = np.fromiter(
+            (line.date.toordinal() if line.date else 0 for line in lines),
+            dtype=np.int32,
+            count=count,
+        )
+        self.cents = np.fromiter((line.amount_cents for line in lines), dtype=np.int64, count=count)
+        self._codes = {}
+
+    def codes(self, grouping, key_fn):
+        if grouping not in self._codes:
+            index = {}
+            codes = np.fromiter(
+                (index.setdefault(key_fn(line), len(index)) for line in self.lines),
+                dtype=np.int32,
+                count=len(self.lines),
+            )
+            self._codes[grouping] = (list(index), codes)
+        return self._codes[grouping]
+
+    def range_mask(self, start, end):
+        return (self.ordinals >= start.toordinal()) & (self.ordinals <= end.toordinal())
+
+
+def columns_for(lines):
+    global _cache
+    if _cache is None or _cache[0] is not lines or _cache[1] != len(lines):
+        _cache = (lines, len(lines), ExpenseColumns(lines))
+    return _cache[2]
+
+
+def _exact_sums(values):
+    return [int(v) for v in np.rint(values)]
+
+
+def bucket_totals(columns, buckets, start, end):
+    if not buckets:
+        return []
+    starts = np.array([b[0].toordinal() for b in buckets], dtype=np.int32)
+    mask = columns.range_mask(start, end)
+    idx = np.searchsorted(starts, columns.ordinals[mask], side="right") - 1
+    sums = np.bincount(idx, weights=columns.cents[mask], minlength=len(buckets))
+    return _exact_sums(sums)
+
+
+def group_totals(columns, start, end, grouping, key_fn):
+    keys, codes = columns.codes(grouping, key_fn)
+    mask = columns.range_mask(start, end)
+    selected = codes[mask]
+    if not selected.size:
+        return {}
+    present, first_seen = np.unique(selected, return_index=True)
+    sums = _exact_sums(np.bincount(selected, weights=columns.cents[mask], minlength=len(keys)))
+    return {keys[code]: sums[code] for code in present[np.argsort(first_seen)]}
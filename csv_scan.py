@@ -0,0 +1,100 @@
+import csv
+import mmap
+import os
+
+from data_store import CSV_HEADERS, DATE_FORMATS, ExpenseLine, journal_path_for, read_journal
+from ledger_index import build_index, open_index, record_end
+from utils import parse_date
+
+
+def _values_to_line(values, date_formats):
+    return ExpenseLine.from_row(dict(zip(CSV_HEADERS, values)), date_formats)
+
+
+def _parse_record(mm, pos, end):
+    return next(csv.reader([mm[pos:end].decode("utf-8")]), [])
+
+
+def scan_lines(path, from_date=None, to_date=None, person=None, date_formats=DATE_FORMATS):
+    low = from_date.toordinal() if from_date else None
+    high = to_date.toordinal() if to_date else None
+    person_field = person.encode("utf-8") if person is not None else None
+    date_formats = list(date_formats)
+    ordinals = {}
+    matches = []
+
+    def date_matches(raw):
+        ordinal = ordinals.get(raw)
+        if ordinal is None:
+            parsed = parse_date(raw.decode("utf-8", "replace"), date_formats)
+            ordinal = ordinals[raw] = parsed.toordinal() if parsed else 0
+        if not ordinal:
+            return False
+        return (low is None or ordinal >= low) and (high is None or ordinal <= high)
+
+    with open(path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return matches
+        with mm:
+            find = mm.find
+            size = len(mm)
+            pos = record_end(mm, 0, size) + 1
+            while pos < size:
+                end = find(b"\n", pos)
+                if end < 0:
+                    end = size
+                if find(b'"', pos, end) >= 0:
+                    end = record_end(mm, pos, size)
+                record_start = pos
+                pos = end + 1
+                if end - record_start <= 1:
+                    continue
+                if mm[record_start] == 0x22:
+                    values = _parse_record(mm, record_start, end)
+                    if not values or not date_matches(values[0].encode("utf-8")):
+                        continue
+                    if person_field is not None and values[1:2] != [person]:
+                        continue
+                    matches.append(_values_to_line(values, date_formats))
+                    continue
+                first_comma = find(b",", record_start, end)
+                if first_comma < 0 or not date_matches(mm[record_start:first_comma]):
+                    continue
+                if person_field is not None:
+                    second_comma = find(b",", first_comma + 1, end)
+                    if second_comma < 0 or mm[first_comma + 1] == 0x22:
+                        values = _parse_record(mm, record_start, end)
+                        if values[1:2] != [person]:
+                            continue
+                        matches.append(_values_to_line(values, date_formats))
+                        continue
+                    if mm[first_comma + 1:second_comma] != person_field:
+                        continue
+                matches.append(_values_to_line(_parse_record(mm, record_start, end), date_formats))
+    return matches
+
+
+def scan(path, from_date=None, to_date=None, person=None, date_formats=DATE_FORMATS):
+    date_formats = list(date_formats)
+    tail, replaced = read_journal(journal_path_for(path), lambda values: _values_to_line(values, date_formats))
+    index = open_index(path, date_formats)
+    if index is None and os.access(os.path.dirname(os.path.abspath(path)), os.W_OK):
+        index, _lines = build_index(path, date_formats)
+        index.save(path)
+    if index is not None:
+        lines = index.query(from_date, to_date, person)
+    else:
+        lines = scan_lines(path, from_date, to_date, person, date_formats)
+    if replaced:
+        lines = [line for line in lines if line.expense_id not in replaced]
+    for line in tail:
+        if not line.date:
+            continue
+        if from_date and line.date < from_date or to_date and line.date > to_date:
+            continue
+        if person is not None and line.person != person:
+            continue
+        lines.append(line)
+    return lines
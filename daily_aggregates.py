@@ -0,0 +1,180 @@
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+from analytics import group_key
+
+
+Cell = namedtuple("Cell", ["person", "store", "category", "sub_category"])
+PATCH_LIMIT = 64
+
+
+class DailyAggregates:
+    def __init__(self, lines=()):
+        self.days = {}
+        self.ordinals = []
+        self._prefixes = {}
+        for line in lines:
+            self.add(line)
+
+    @classmethod
+    def from_cells(cls, cells):
+        aggregates = cls()
+        days = aggregates.days
+        for ordinal, cell, cents, count in cells:
+            entry = days.setdefault(ordinal, {}).setdefault(Cell(*cell), [0, 0])
+            entry[0] += cents
+            entry[1] += count
+        aggregates.ordinals = sorted(days)
+        return aggregates
+
+    def add(self, line, sign=1):
+        if not line.date:
+            return
+        ordinal = line.date.toordinal()
+        cells = self.days.get(ordinal)
+        if cells is None:
+            if sign < 0:
+                return
+            cells = self.days[ordinal] = {}
+            idx = bisect_left(self.ordinals, ordinal)
+            self.ordinals.insert(idx, ordinal)
+            self._shift_prefixes(idx, insert=True)
+        else:
+            idx = bisect_left(self.ordinals, ordinal)
+        cell = Cell(line.person, line.store, line.category, line.sub_category)
+        entry = cells.get(cell)
+        if entry is None:
+            entry = cells[cell] = [0, 0]
+        entry[0] += sign * line.amount_cents
+        entry[1] += sign
+        self._patch_prefixes(idx, cell, sign * line.amount_cents, sign)
+        if entry[1] <= 0:
+            del cells[cell]
+            if not cells:
+                del self.days[ordinal]
+                del self.ordinals[idx]
+                self._shift_prefixes(idx, insert=False)
+
+    def remove(self, line):
+        self.add(line, -1)
+
+    def apply(self, removed, added):
+        if len(removed) + len(added) > PATCH_LIMIT:
+            self._prefixes.clear()
+        for line in removed:
+            self.remove(line)
+        for line in added:
+            self.add(line)
+
+    def _shift_prefixes(self, idx, insert):
+        for columns in self._prefixes.values():
+            for column in columns.values():
+                for values in column:
+                    if insert:
+                        values.insert(idx + 1, values[idx])
+                    else:
+                        del values[idx + 1]
+
+    def _patch_prefixes(self, idx, cell, cents, count):
+        start = idx + 1
+        for (grouping, person), columns in self._prefixes.items():
+            if person is not None and cell.person != person:
+                continue
+            group = group_key(cell, grouping) if grouping else None
+            column = columns.get(group)
+            if column is None:
+                size = len(self.ordinals) + 1
+                column = columns[group] = ([0] * size, [0] * size)
+            sums, counts = column
+            sums[start:] = [value + cents for value in sums[start:]]
+            counts[start:] = [value + count for value in counts[start:]]
+
+    def _days_in(self, from_date, to_date):
+        lo, hi = self._bounds(from_date, to_date)
+        for ordinal in self.ordinals[lo:hi]:
+            yield ordinal, self.days[ordinal]
+
+    def day_totals(self, from_date, to_date, person=None):
+        totals = []
+        for ordinal, cells in self._days_in(from_date, to_date):
+            matched = False
+            cents = 0
+            for cell, (amount, _count) in cells.items():
+                if person is None or cell.person == person:
+                    matched = True
+                    cents += amount
+            if matched:
+                totals.append((ordinal, cents))
+        return totals
+
+    def prefix_sums(self, grouping=None, person=None):
+        key = (grouping, person)
+        columns = self._prefixes.get(key)
+        if columns is not None:
+            return columns
+        columns = {}
+        size = len(self.ordinals) + 1
+        for idx, ordinal in enumerate(self.ordinals, 1):
+            for cell, (amount, count) in self.days[ordinal].items():
+                if person is not None and cell.person != person:
+                    continue
+                group = group_key(cell, grouping) if grouping else None
+                column = columns.get(group)
+                if column is None:
+                    column = columns[group] = ([0] * size, [0] * size)
+                column[0][idx] += amount
+                column[1][idx] += count
+        for cents, counts in columns.values():
+            for idx in range(1, size):
+                cents[idx] += cents[idx - 1]
+                counts[idx] += counts[idx - 1]
+        self._prefixes[key] = columns
+        return columns
+
+    def _bounds(self, from_date, to_date):
+        lo = bisect_left(self.ordinals, from_date.toordinal()) if from_date else 0
+        hi = bisect_right(self.ordinals, to_date.toordinal()) if to_date else len(self.ordinals)
+        return lo, hi
+
+    def range_totals(self, ranges, person=None):
+        columns = self._prefixes.get((None, person))
+        if columns is None:
+            return self._walk_range_totals(ranges, person)
+        column = columns.get(None)
+        if column is None:
+            return [0 for _ in ranges]
+        cents = column[0]
+        totals = []
+        for start, end in ranges:
+            lo, hi = self._bounds(start, end)
+            totals.append(cents[hi] - cents[lo] if hi > lo else 0)
+        return totals
+
+    def _walk_range_totals(self, ranges, person):
+        totals = [0 for _ in ranges]
+        if not ranges:
+            return totals
+        starts = [start.toordinal() for start, _end in ranges]
+        for ordinal, cents in self.day_totals(ranges[0][0], ranges[-1][1], person):
+            idx = bisect_right(starts, ordinal) - 1
+            if idx >= 0 and ordinal <= ranges[idx][1].toordinal():
+                totals[idx] += cents
+        return totals
+
+    def group_totals(self, from_date, to_date, grouping, person=None):
+        lo, hi = self._bounds(from_date, to_date)
+        if hi <= lo:
+            return {}
+        columns = self._prefixes.get((grouping, person))
+        if columns is None:
+            return self._walk_group_totals(from_date, to_date, grouping, person)
+        return {key: cents[hi] - cents[lo] for key, (cents, counts) in columns.items() if counts[hi] > counts[lo]}
+
+    def _walk_group_totals(self, from_date, to_date, grouping, person):
+        totals = {}
+        for _ordinal, cells in self._days_in(from_date, to_date):
+            for cell, (amount, _count) in cells.items():
+                if person is None or cell.person == person:
+                    key = group_key(cell, grouping)
+                    totals[key] = totals.get(key, 0) + amount
+        return totals
@@ -1,8 +1,15 @@
 import csv
 import json
 import os
+import threading
+from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right
 from datetime import datetime
-from uuid import uuid4
+from decimal import InvalidOperation
+from sys import intern
+
+import instrumentation
+from utils import cents_to_decimal, cents_to_str, parse_cents, parse_date
 
 
 DATA_DIR = "data"
@@ -27,6 +34,90 @@ CSV_HEADERS = [
     "expense_id",
     "created_at",
 ]
+DATE_FORMATS = ["%d.%m.%Y", "%Y-%m-%d", "%m/%d/%Y"]
+DATE_SAMPLE_SIZE = 256
+JOURNAL_COMPACT_BYTES = 1024 * 1024
+WRITE_BUFFER_BYTES = 1024 * 1024
+SCHEMA_VERSION = 1
+INCREMENTAL_INDEX_LINES = 1000
+TOMBSTONE_PACK_FRACTION = 0.25
+ID_POOL_SIZE = 1024
+
+DEFAULT_DATA = {
+    "people": ["Tinka", "Aljaz"],
+    "categories": {
+        "Groceries": ["Food", "Drinks"],
+        "Cosmetics": ["Makeup", "Skincare"],
+        "Pharmaceuticals": ["Medicine"],
+    },
+    "stores": {
+        "DM": {"category": "Cosmetics", "sub": "Makeup"},
+        "Spar": {"category": "Groceries", "sub": "Food"},
+    },
+    "settings": {
+        "currency": "EUR",
+        "date_format": "%d.%m.%Y",
+    },
+}
+
+
+def _fsync_directory(path):
+    if os.name != "posix":
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _read_umask():
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+UMASK = _read_umask()
+
+
+def _target_mode(path):
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except OSError:
+        return 0o666 & ~UMASK
+
+
+def write_temp(path, write, mode="w", newline=None):
+    import tempfile
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    text_args = {} if "b" in mode else {"encoding": "utf-8", "newline": newline}
+    try:
+        with open(fd, mode, buffering=WRITE_BUFFER_BYTES, **text_args) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, _target_mode(path))
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return tmp_path
+
+
+def commit_temp(tmp_path, path):
+    os.replace(tmp_path, path)
+    _fsync_directory(path)
+
+
+def atomic_write(path, write, mode="w", newline=None):
+    commit_temp(write_temp(path, write, mode, newline), path)
+
+
+def _write_csv(f, rows):
+    writer = csv.writer(f)
+    writer.writerow(CSV_HEADERS)
+    writer.writerows(rows)
 
 
 def load_json(name, default_data):
@@ -41,52 +132,743 @@ def load_json(name, default_data):
 
 
 def save_json(name, data):
-    with open(FILES[name], "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    payload = json.dumps(data, indent=2, ensure_ascii=False)
+    atomic_write(FILES[name], lambda f: f.write(payload))
 
 
-def ensure_expense_file():
-    if not os.path.exists(EXPENSE_FILE):
-        with open(EXPENSE_FILE, "w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=CSV_HEADERS)
-            writer.writeheader()
-        return
+def schema_marker_path_for(path):
+    return f"{path}.schema"
 
-    with open(EXPENSE_FILE, "r", newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        old_headers = reader.fieldnames or []
-        rows = list(reader)
 
-    if old_headers == CSV_HEADERS:
-        return
+def _schema_marker_matches(path):
+    try:
+        with open(schema_marker_path_for(path), "r", encoding="utf-8") as f:
+            marker = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return (
+        marker.get("version") == SCHEMA_VERSION
+        and marker.get("signature") == list(_file_signature(path) or [])
+    )
+
+
+def _write_schema_marker(path):
+    marker = {"version": SCHEMA_VERSION, "signature": list(_file_signature(path) or [])}
+    try:
+        atomic_write(schema_marker_path_for(path), lambda f: json.dump(marker, f))
+    except OSError:
+        pass
+
+
+def random_expense_ids():
+    while True:
+        pool = os.urandom(4 * ID_POOL_SIZE)
+        for offset in range(0, len(pool), 4):
+            yield pool[offset:offset + 4].hex()
+
+
+def unique_expense_ids(is_taken=None):
+    issued = set()
+    for expense_id in random_expense_ids():
+        if expense_id in issued or (is_taken is not None and is_taken(expense_id)):
+            continue
+        issued.add(expense_id)
+        yield expense_id
+
+
+def _existing_expense_ids(path):
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        taken = {row.get("expense_id") or "" for row in csv.DictReader(f)}
+    tail, replaced = read_journal(
+        journal_path_for(path), lambda values: ExpenseLine.from_row(dict(zip(CSV_HEADERS, values)), DATE_FORMATS)
+    )
+    taken.update(replaced)
+    taken.update(line.expense_id for line in tail)
+    return taken
+
 
-    migrated_rows = []
-    for row in rows:
+def _migrated_rows(reader, old_headers, is_taken=None):
+    created_at = datetime.now().isoformat(timespec="seconds")
+    ids = unique_expense_ids(is_taken)
+    kept = [h for h in old_headers if h in CSV_HEADERS]
+    for row in reader:
         migrated = {h: "" for h in CSV_HEADERS}
-        for h in old_headers:
-            if h in migrated:
-                migrated[h] = row.get(h, "")
+        for h in kept:
+            migrated[h] = row.get(h) or ""
         if not migrated["person"]:
             migrated["person"] = "Unknown"
         if not migrated["expense_id"]:
-            migrated["expense_id"] = uuid4().hex[:8]
+            migrated["expense_id"] = next(ids)
         if not migrated["created_at"]:
-            migrated["created_at"] = datetime.now().isoformat(timespec="seconds")
-        migrated_rows.append(migrated)
+            migrated["created_at"] = created_at
+        yield [migrated[h] for h in CSV_HEADERS]
+
+
+def migrate_expense_file(path=EXPENSE_FILE):
+    taken = _existing_expense_ids(path)
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        old_headers = reader.fieldnames or []
+        tmp_path = write_temp(
+            path, lambda out: _write_csv(out, _migrated_rows(reader, old_headers, taken.__contains__)), newline=""
+        )
+    commit_temp(tmp_path, path)
+
+
+def ensure_expense_file(path=EXPENSE_FILE):
+    if not os.path.exists(path):
+        atomic_write(path, lambda f: _write_csv(f, []), newline="")
+        _write_schema_marker(path)
+        return
+
+    if _schema_marker_matches(path):
+        return
+
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        old_headers = next(csv.reader(f), [])
+    if old_headers != CSV_HEADERS:
+        migrate_expense_file(path)
+    _write_schema_marker(path)
+
+
+class ExpenseLine:
+    __slots__ = (
+        "date",
+        "date_text",
+        "person",
+        "store",
+        "total_cents",
+        "category",
+        "sub_category",
+        "amount_cents",
+        "expense_id",
+        "created_at",
+    )
+
+    def __init__(
+        self,
+        date,
+        date_text,
+        person,
+        store,
+        total_cents,
+        category,
+        sub_category,
+        amount_cents,
+        expense_id,
+        created_at,
+    ):
+        self.date = date
+        self.date_text = date_text
+        self.person = person
+        self.store = store
+        self.total_cents = total_cents
+        self.category = category
+        self.sub_category = sub_category
+        self.amount_cents = amount_cents
+        self.expense_id = expense_id
+        self.created_at = created_at
+
+    @classmethod
+    def from_row(cls, row, date_formats):
+        date_text = intern(row.get("date") or "")
+        return cls(
+            parse_date(date_text, date_formats),
+            date_text,
+            intern(row.get("person") or ""),
+            intern(row.get("store") or ""),
+            _cents_or_zero(row.get("total")),
+            intern(row.get("category") or ""),
+            intern(row.get("sub_category") or ""),
+            _cents_or_zero(row.get("amount")),
+            row.get("expense_id") or "",
+            row.get("created_at") or "",
+        )
+
+    @property
+    def amount(self):
+        return cents_to_decimal(self.amount_cents)
+
+    @property
+    def total(self):
+        return cents_to_decimal(self.total_cents)
+
+    def as_values(self):
+        return (
+            self.date_text,
+            self.person,
+            self.store,
+            cents_to_str(self.total_cents),
+            self.category,
+            self.sub_category,
+            cents_to_str(self.amount_cents),
+            self.expense_id,
+            self.created_at,
+        )
+
+    def as_row(self):
+        return dict(zip(CSV_HEADERS, self.as_values()))
+
+
+def _expense_key(line):
+    return (line.date_text, line.person, line.store, line.total_cents)
+
+
+def _shares_id(lines):
+    return len({_expense_key(line) for line in lines}) > 1
+
+
+def _cents_or_zero(value):
+    try:
+        return parse_cents(value)
+    except (ValueError, InvalidOperation):
+        return 0
+
+
+def _file_signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def journal_path_for(path):
+    return f"{os.path.splitext(path)[0]}.journal"
+
+
+def read_journal(journal_path, values_to_line):
+    tail = {}
+    replaced = set()
+    try:
+        f = open(journal_path, "rb")
+    except FileNotFoundError:
+        return [], replaced
+    with f:
+        for raw in f:
+            try:
+                record = json.loads(raw.decode("utf-8"))
+            except (UnicodeDecodeError, json.JSONDecodeError):
+                continue
+            expense_id = record.get("expense_id", "")
+            replaced.add(expense_id)
+            tail.pop(expense_id, None)
+            if record.get("op") == "upsert":
+                for values in record.get("rows", []):
+                    line = values_to_line(values)
+                    tail.setdefault(line.expense_id, []).append(line)
+    return [line for lines in tail.values() for line in lines], replaced
+
+
+class ExpenseBackend(ABC):
+    supports_aggregates = False
+
+    def __init__(self, date_formats=None):
+        self.date_formats = list(date_formats or DATE_FORMATS)
+        self._parse_formats = self.date_formats
 
-    with open(EXPENSE_FILE, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=CSV_HEADERS)
-        writer.writeheader()
-        writer.writerows(migrated_rows)
+    def set_date_format(self, date_format):
+        formats = [date_format] + DATE_FORMATS
+        if formats != self.date_formats:
+            self.date_formats = formats
+            self._parse_formats = formats
+            self.invalidate()
+
+    def invalidate(self):
+        pass
+
+    def to_line(self, row):
+        if isinstance(row, ExpenseLine):
+            return row
+        return ExpenseLine.from_row(row, self._parse_formats)
+
+    @abstractmethod
+    def lines(self):
+        """Return every stored line in file order."""
+
+    @abstractmethod
+    def query(self, from_date=None, to_date=None, person=None):
+        """Return the dated lines within the range, optionally for one person."""
+
+    @abstractmethod
+    def expense_lines(self, expense_id):
+        """Return the lines stored under an expense_id."""
+
+    def line_count(self):
+        return len(self.lines())
+
+    def has_expense(self, expense_id):
+        return bool(self.expense_lines(expense_id))
+
+    def id_collides(self, expense_id):
+        return _shares_id(self.expense_lines(expense_id))
+
+    def new_expense_ids(self):
+        return unique_expense_ids(self.has_expense)
+
+    def new_expense_id(self):
+        return next(self.new_expense_ids())
+
+    @abstractmethod
+    def append(self, rows):
+        """Add rows, keeping lines already stored under the same expense_id."""
+
+    @abstractmethod
+    def replace_expense(self, expense_id, rows):
+        """Replace all lines of an expense with rows."""
+
+    @abstractmethod
+    def delete_expense(self, expense_id):
+        """Remove all lines of an expense."""
+
+    @abstractmethod
+    def replace_all(self, rows):
+        """Replace the whole ledger with rows."""
+
+    def warm_totals(self, grouping, person=None):
+        pass
+
+    def range_totals(self, ranges, person=None):
+        totals = [0 for _ in ranges]
+        if not ranges:
+            return totals
+        starts = [start.toordinal() for start, _end in ranges]
+        for ordinal, cents in self.day_totals(ranges[0][0], ranges[-1][1], person):
+            idx = bisect_right(starts, ordinal) - 1
+            if idx >= 0 and ordinal <= ranges[idx][1].toordinal():
+                totals[idx] += cents
+        return totals
+
+
+class Ledger(ExpenseBackend):
+    supports_aggregates = True
+
+    def __init__(self, path, date_formats=None):
+        super().__init__(date_formats)
+        self.path = path
+        self.journal_path = journal_path_for(path)
+        self.compact_bytes = JOURNAL_COMPACT_BYTES
+        self._lines = []
+        self._signature = None
+        self._date_index = None
+        self._person_index = None
+        self._expense_index = None
+        self._collisions = None
+        self._tombstones = 0
+        self._aggregates = None
+        self._lock = threading.RLock()
+        self._base_generation = 0
+        self._compacting = False
+
+    def _stat_signature(self):
+        return (_file_signature(self.path), _file_signature(self.journal_path))
+
+    def is_stale(self):
+        return self._signature is None or self._stat_signature() != self._signature
+
+    def invalidate(self):
+        self._signature = None
+
+    def _values_to_line(self, values):
+        return self.to_line(dict(zip(CSV_HEADERS, values)))
+
+    def _load(self):
+        from ledger_index import IndexedLines, build_index, open_index
+
+        signature = self._stat_signature()
+        index = open_index(self.path, self.date_formats)
+        if index is None:
+            index, lines = build_index(self.path, self.date_formats)
+            index.save(self.path)
+        else:
+            lines = IndexedLines(index)
+        self._parse_formats = index.parse_formats
+        tail, replaced = self._replay_journal()
+        self._lines = lines
+        self._signature = signature
+        self._base_generation += 1
+        self._reset_positions()
+        self._aggregates = None
+        if replaced:
+            self._remove_expense_lines(replaced)
+            first_pos = len(self._lines)
+            self._lines.extend(tail)
+            self._index_expenses(first_pos)
+            if self._tombstones > len(self._lines) * TOMBSTONE_PACK_FRACTION:
+                self._pack_tombstones()
+        self._maybe_compact()
+
+    def _indexed_lines(self):
+        from ledger_index import IndexedLines
+
+        return self._lines if isinstance(self._lines, IndexedLines) else None
+
+    def _all_lines(self):
+        indexed = self._indexed_lines()
+        if indexed is not None:
+            self._lines = indexed.materialize()
+        return self._lines
+
+    def _replay_journal(self):
+        return read_journal(self.journal_path, self._values_to_line)
+
+    def _drop_indexes(self):
+        self._date_index = None
+        self._person_index = None
+
+    def _reset_positions(self):
+        self._drop_indexes()
+        self._expense_index = None
+        self._collisions = None
+        self._tombstones = 0
+
+    def _pack_tombstones(self):
+        self._lines = [line for line in self._all_lines() if line is not None]
+        self._reset_positions()
+
+    def _build_indexes(self):
+        indexed = self._indexed_lines()
+        if indexed is not None:
+            order = indexed.dated_entries()
+        else:
+            order = sorted(
+                (line.date.toordinal(), pos, line.person) for pos, line in enumerate(self._lines) if line and line.date
+            )
+        self._date_index = ([o for o, _p, _n in order], [p for _o, p, _n in order])
+        self._person_index = {}
+        for ordinal, pos, person in order:
+            ordinals, positions = self._person_index.setdefault(person, ([], []))
+            ordinals.append(ordinal)
+            positions.append(pos)
+
+    def _index_appended(self, first_pos):
+        for pos in range(first_pos, len(self._lines)):
+            line = self._lines[pos]
+            if not line.date:
+                continue
+            ordinal = line.date.toordinal()
+            for ordinals, positions in (
+                self._date_index,
+                self._person_index.setdefault(line.person, ([], [])),
+            ):
+                idx = bisect_right(ordinals, ordinal)
+                ordinals.insert(idx, ordinal)
+                positions.insert(idx, pos)
+
+    def _expense_positions(self):
+        if self._expense_index is None:
+            indexed = self._indexed_lines()
+            if indexed is not None:
+                index = indexed.expense_positions()
+                self._collisions = indexed.collisions(index)
+            else:
+                index = {}
+                for pos, line in enumerate(self._lines):
+                    if line is not None:
+                        index.setdefault(line.expense_id, []).append(pos)
+                self._collisions = {
+                    expense_id
+                    for expense_id, positions in index.items()
+                    if len(positions) > 1 and _shares_id(self._lines[pos] for pos in positions)
+                }
+            self._expense_index = index
+            instrumentation.count("id_collisions", len(self._collisions))
+        return self._expense_index
+
+    def _current_lines(self):
+        if self.is_stale():
+            self._load()
+        return self._lines
+
+    def query(self, from_date=None, to_date=None, person=None):
+        with self._lock:
+            lines = self._current_lines()
+            if self._date_index is None:
+                self._build_indexes()
+            if person is None:
+                ordinals, positions = self._date_index
+            else:
+                ordinals, positions = self._person_index.get(person, ([], []))
+            lo = bisect_left(ordinals, from_date.toordinal()) if from_date else 0
+            hi = bisect_right(ordinals, to_date.toordinal()) if to_date else len(ordinals)
+            instrumentation.count("rows_scanned", hi - lo)
+            return [lines[pos] for pos in sorted(positions[lo:hi]) if lines[pos] is not None]
+
+    def aggregates(self):
+        from daily_aggregates import DailyAggregates
+
+        with self._lock:
+            lines = self._current_lines()
+            if self._aggregates is None:
+                indexed = self._indexed_lines()
+                if indexed is not None:
+                    self._aggregates = DailyAggregates.from_cells(indexed.day_cells())
+                else:
+                    self._aggregates = DailyAggregates(line for line in lines if line is not None)
+            return self._aggregates
+
+    def day_totals(self, from_date, to_date, person=None):
+        with self._lock:
+            return self.aggregates().day_totals(from_date, to_date, person)
+
+    def range_totals(self, ranges, person=None):
+        with self._lock:
+            return self.aggregates().range_totals(ranges, person)
+
+    def group_totals(self, from_date, to_date, grouping, person=None):
+        with self._lock:
+            return self.aggregates().group_totals(from_date, to_date, grouping, person)
+
+    def warm_totals(self, grouping, person=None):
+        with self._lock:
+            aggregates = self.aggregates()
+            aggregates.prefix_sums(None, person)
+            aggregates.prefix_sums(grouping, person)
+
+    def lines(self):
+        with self._lock:
+            self._current_lines()
+            lines = self._all_lines()
+            if self._tombstones:
+                return [line for line in lines if line is not None]
+            return lines
+
+    def line_count(self):
+        with self._lock:
+            return len(self._current_lines()) - self._tombstones
+
+    def expense_lines(self, expense_id):
+        with self._lock:
+            lines = self._current_lines()
+            return [lines[pos] for pos in self._expense_positions().get(expense_id, ())]
+
+    def has_expense(self, expense_id):
+        with self._lock:
+            self._current_lines()
+            return expense_id in self._expense_positions()
+
+    def id_collides(self, expense_id):
+        with self._lock:
+            self._current_lines()
+            self._expense_positions()
+            return expense_id in self._collisions
+
+    def id_collisions(self):
+        with self._lock:
+            self._current_lines()
+            self._expense_positions()
+            return sorted(self._collisions)
+
+    def _journal_write(self, records):
+        payload = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records).encode("utf-8")
+        with open(self.journal_path, "a+b") as f:
+            if f.tell():
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    payload = b"\n" + payload
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _remove_expense_lines(self, expense_ids):
+        index = self._expense_positions()
+        removed = []
+        for expense_id in expense_ids:
+            for pos in index.pop(expense_id, ()):
+                removed.append(self._lines[pos])
+                self._lines[pos] = None
+            self._collisions.discard(expense_id)
+        self._tombstones += len(removed)
+        return removed
+
+    def _index_expenses(self, first_pos):
+        index = self._expense_positions()
+        for pos in range(first_pos, len(self._lines)):
+            index.setdefault(self._lines[pos].expense_id, []).append(pos)
+        for expense_id in {line.expense_id for line in self._lines[first_pos:]}:
+            if _shares_id(self._lines[pos] for pos in index[expense_id]):
+                self._collisions.add(expense_id)
+
+    def _commit_changes(self, changes):
+        records = []
+        for expense_id, lines in changes:
+            if lines:
+                rows = [line.as_values() for line in lines]
+                records.append({"op": "upsert", "expense_id": expense_id, "rows": rows})
+            else:
+                records.append({"op": "tombstone", "expense_id": expense_id})
+        self._journal_write(records)
+        removed = self._remove_expense_lines({expense_id for expense_id, _lines in changes})
+        first_pos = len(self._lines)
+        for _expense_id, lines in changes:
+            self._lines.extend(lines)
+        self._index_expenses(first_pos)
+        if self._date_index is not None:
+            if len(self._lines) - first_pos > INCREMENTAL_INDEX_LINES:
+                self._drop_indexes()
+            else:
+                self._index_appended(first_pos)
+        if self._aggregates is not None:
+            self._aggregates.apply(removed, self._lines[first_pos:])
+        if self._tombstones > len(self._lines) * TOMBSTONE_PACK_FRACTION:
+            self._pack_tombstones()
+        self._signature = self._stat_signature()
+        self._maybe_compact()
+
+    def append(self, rows):
+        with self._lock:
+            self._current_lines()
+            grouped = {}
+            for row in rows:
+                line = self.to_line(row)
+                grouped.setdefault(line.expense_id, []).append(line)
+            index = self._expense_positions()
+            self._commit_changes(
+                [
+                    (expense_id, [self._lines[pos] for pos in index.get(expense_id, ())] + lines)
+                    for expense_id, lines in grouped.items()
+                ]
+            )
+
+    def replace_expense(self, expense_id, rows):
+        with self._lock:
+            self._current_lines()
+            self._commit_changes([(expense_id, [self.to_line(row) for row in rows])])
+
+    def delete_expense(self, expense_id):
+        with self._lock:
+            self._current_lines()
+            self._commit_changes([(expense_id, [])])
+
+    def _write_base(self, lines):
+        return write_temp(self.path, lambda f: _write_csv(f, (line.as_values() for line in lines)), newline="")
+
+    def _index_base(self, tmp_path, lines):
+        from ledger_index import index_written_lines
+
+        return index_written_lines(tmp_path, lines, self.date_formats, self._parse_formats)
+
+    def _save_base_index(self, index):
+        from ledger_index import remove_index
+
+        if index is None:
+            remove_index(self.path)
+        else:
+            index.save(self.path)
+
+    def replace_all(self, rows):
+        with self._lock:
+            lines = [self.to_line(row) for row in rows]
+            tmp_path = self._write_base(lines)
+            index = self._index_base(tmp_path, lines)
+            self._truncate_journal()
+            commit_temp(tmp_path, self.path)
+            _write_schema_marker(self.path)
+            self._save_base_index(index)
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+                _fsync_directory(self.journal_path)
+            self._lines = lines
+            self._base_generation += 1
+            self._signature = self._stat_signature()
+            self._reset_positions()
+            self._aggregates = None
+
+    def _truncate_journal(self):
+        try:
+            f = open(self.journal_path, "r+b")
+        except FileNotFoundError:
+            return
+        with f:
+            f.truncate(0)
+            os.fsync(f.fileno())
+
+    def _maybe_compact(self):
+        if self._compacting or _file_size(self.journal_path) < self.compact_bytes:
+            return
+        self._compacting = True
+        threading.Thread(target=self._compact_in_background, daemon=True).start()
+
+    def _compact_in_background(self):
+        try:
+            self.compact()
+        except OSError:
+            pass
+        finally:
+            self._compacting = False
+
+    def compact(self):
+        with self._lock:
+            lines = list(self.lines())
+            generation = self._base_generation
+            journal_offset = _file_size(self.journal_path)
+        if not journal_offset:
+            return
+        tmp_path = self._write_base(lines)
+        index = self._index_base(tmp_path, lines)
+        with self._lock:
+            if generation != self._base_generation or self.is_stale():
+                os.remove(tmp_path)
+                return
+            commit_temp(tmp_path, self.path)
+            _write_schema_marker(self.path)
+            self._save_base_index(index)
+            self._drop_journal_prefix(journal_offset)
+            self._base_generation += 1
+            self._signature = self._stat_signature()
+
+    def _drop_journal_prefix(self, offset):
+        with open(self.journal_path, "rb") as f:
+            f.seek(offset)
+            rest = f.read()
+        if not rest:
+            os.remove(self.journal_path)
+            _fsync_directory(self.journal_path)
+            return
+        atomic_write(self.journal_path, lambda f: f.write(rest), mode="wb")
+
+
+_ledger = Ledger(EXPENSE_FILE)
+
+
+def get_ledger():
+    return _ledger
+
+
+def set_ledger(backend):
+    global _ledger
+    _ledger = backend
+
+
+def open_backend(kind, date_format=DATE_FORMATS[0], path=EXPENSE_FILE):
+    if kind == "sqlite":
+        from sqlite_store import SQLITE_FILE, SqliteLedger
+
+        created = not os.path.exists(SQLITE_FILE)
+        backend = SqliteLedger(SQLITE_FILE)
+        backend.set_date_format(date_format)
+        if created and os.path.exists(path):
+            backend.import_csv(path)
+        return backend
+    backend = Ledger(path)
+    backend.set_date_format(date_format)
+    return backend
 
 
 def read_expenses():
-    with open(EXPENSE_FILE, "r", newline="", encoding="utf-8") as f:
-        return list(csv.DictReader(f))
+    return _ledger.lines()
 
 
 def write_expenses(rows):
-    with open(EXPENSE_FILE, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=CSV_HEADERS)
-        writer.writeheader()
-        writer.writerows(rows)
+    _ledger.replace_all(rows)
+
+
+def append_expenses(rows):
+    _ledger.append(rows)
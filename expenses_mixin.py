@@ -1,16 +1,17 @@
-import csv
 from datetime import datetime
 from decimal import Decimal, InvalidOperation
-from uuid import uuid4
 
 import tkinter as tk
-from tkinter import messagebox, ttk
-from tkcalendar import DateEntry
+from tkinter import filedialog, messagebox, ttk
 
-from data_store import CSV_HEADERS
+from data_store import append_expenses, get_ledger
+from importer import import_csv
 from utils import decimal_to_str, parse_decimal
 
 
+IMPORT_PROGRESS_MS = 200
+
+
 class ExpensesMixin:
     def build_expense_tab(self):
         f = self.tab_expense
@@ -34,7 +35,7 @@ class ExpensesMixin:
         self.store_cb.bind("<<ComboboxSelected>>", self.apply_store_defaults)
 
         ttk.Label(setup, text="Date").grid(row=0, column=4, sticky="w", padx=6, pady=4)
-        self.date_entry = DateEntry(setup, date_pattern="dd.mm.yyyy")
+        self.date_entry = self.make_date_entry(setup)
         self.date_entry.grid(row=0, column=5, sticky="ew", padx=6, pady=4)
 
         ttk.Label(setup, text="Total").grid(row=1, column=0, sticky="w", padx=6, pady=4)
@@ -177,28 +178,75 @@ class ExpensesMixin:
         date = self.date_entry.get()
         person = self.person_cb.get()
         store = self.store_cb.get()
-        expense_id = uuid4().hex[:8]
+        breakdown = list(self.breakdown)
+        self.when_ledger_loaded(lambda: self._save_expense(date, person, store, total, breakdown))
+
+    def _save_expense(self, date, person, store, total, breakdown):
+        expense_id = get_ledger().new_expense_id()
         created_at = datetime.now().isoformat(timespec="seconds")
-        line_count = len(self.breakdown)
-
-        with open("expenses.csv", "a", newline="", encoding="utf-8") as f:
-            w = csv.DictWriter(f, fieldnames=CSV_HEADERS)
-            for cat, sub, amt in self.breakdown:
-                w.writerow(
-                    {
-                        "date": date,
-                        "person": person,
-                        "store": store,
-                        "total": decimal_to_str(total),
-                        "category": cat,
-                        "sub_category": sub,
-                        "amount": decimal_to_str(amt),
-                        "expense_id": expense_id,
-                        "created_at": created_at,
-                    }
-                )
+        line_count = len(breakdown)
+
+        rows = [
+            {
+                "date": date,
+                "person": person,
+                "store": store,
+                "total": decimal_to_str(total),
+                "category": cat,
+                "sub_category": sub,
+                "amount": decimal_to_str(amt),
+                "expense_id": expense_id,
+                "created_at": created_at,
+            }
+            for cat, sub, amt in breakdown
+        ]
+        append_expenses(rows)
 
         messagebox.showinfo("Saved", "Expense saved.")
         self.set_status(f"Saved expense {expense_id} with {line_count} lines.")
         self.clear_expense_form()
-        self.refresh_history()
+        self.refresh_history(keep_position=True)
+
+    def import_expenses_csv(self):
+        path = filedialog.askopenfilename(
+            title="Import expenses CSV",
+            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
+        )
+        if not path:
+            return
+        self.when_ledger_loaded(lambda: self._start_import(path))
+
+    def _start_import(self, path):
+        self.import_progress = (0, 0)
+        self.set_status(f"Importing {path}\u2026")
+
+        def progress(imported, skipped):
+            self.import_progress = (imported, skipped)
+
+        future = self.run_in_background(
+            import_csv,
+            path,
+            get_ledger(),
+            stores=self.stores,
+            progress=progress,
+            on_done=lambda report: self._on_import_done(path, report),
+        )
+        self._show_import_progress(future)
+
+    def _show_import_progress(self, future):
+        if future.done():
+            return
+        imported, skipped = self.import_progress
+        self.set_status(f"Importing\u2026 {imported} lines imported, {skipped} skipped")
+        self.after(IMPORT_PROGRESS_MS, self._show_import_progress, future)
+
+    def _on_import_done(self, path, report):
+        self.set_status(f"Imported {report['imported']} lines, skipped {report['skipped']} from {path}")
+        if report["failed"]:
+            messagebox.showerror(
+                "Import",
+                f"Import stopped after {report['imported']} lines:\n{report['failed']}",
+            )
+        elif report["errors"]:
+            messagebox.showwarning("Import", "Some rows were skipped:\n" + "\n".join(report["errors"]))
+        self.refresh_history(keep_position=True)
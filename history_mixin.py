@@ -1,27 +1,47 @@
 import csv
 import math
 import tkinter as tk
-from datetime import datetime, timedelta
+from datetime import datetime
 from decimal import Decimal, InvalidOperation
 from tkinter import filedialog, messagebox, ttk
 
-from tkcalendar import DateEntry
-
-from analytics import aggregate_by_bucket, aggregate_pie
-from data_store import CSV_HEADERS, read_expenses, write_expenses
-from utils import decimal_to_str, parse_date, parse_decimal
+import instrumentation
+from analytics import (
+    PERIODS,
+    aggregate_by_bucket,
+    aggregate_by_bucket_in,
+    aggregate_pie,
+    aggregate_pie_in,
+    granularity_options,
+    period_range,
+)
+from canvas_pool import CanvasPool
+from data_store import CSV_HEADERS, get_ledger
+from history_table import VirtualTable
+from utils import cents_to_str, decimal_to_str, parse_date, parse_decimal
 
 
 class HistoryMixin:
     def parse_date_for_filter(self, date_str):
-        formats = [self.settings.get("date_format", "%d.%m.%Y"), "%d.%m.%Y", "%Y-%m-%d", "%m/%d/%Y"]
-        return parse_date(date_str, formats)
+        return parse_date(date_str, get_ledger().date_formats)
 
     def get_selected_expense_id(self):
-        selected = self.history_tree.selection()
-        if not selected:
+        line = self.history_table.selected_record()
+        if line is None:
             return None
-        return self.history_tree.item(selected[0], "values")[7]
+        return line.expense_id
+
+    def history_row_values(self, line):
+        return (
+            line.date_text,
+            line.person,
+            line.store,
+            line.category,
+            line.sub_category,
+            cents_to_str(line.amount_cents),
+            cents_to_str(line.total_cents),
+            line.expense_id,
+        )
 
     def on_from_selected(self, _event=None):
         self.after(1, self._apply_from_selected)
@@ -51,15 +71,22 @@ class HistoryMixin:
         self.from_last_value = self.from_var.get().strip()
         self.debug_log(f"from typed: {self.from_last_value}")
         self.from_enabled_var.set(True)
-        self.refresh_history()
+        self.schedule_refresh("table")
 
     def on_to_typed(self, _event=None):
         self.to_last_value = self.to_var.get().strip()
         self.debug_log(f"to typed: {self.to_last_value}")
         self.to_enabled_var.set(True)
-        self.refresh_history()
+        self.schedule_refresh("table")
 
     def refresh_after_calendar_closes(self, date_entry):
+        key = str(date_entry)
+        if key in self.calendar_polls:
+            return
+        self.calendar_polls.add(key)
+        self._poll_calendar_closed(date_entry)
+
+    def _poll_calendar_closed(self, date_entry):
         top_cal = getattr(date_entry, "_top_cal", None)
         is_open = False
         if top_cal is not None:
@@ -68,9 +95,10 @@ class HistoryMixin:
             except tk.TclError:
                 is_open = False
         if is_open:
-            self.after(80, lambda: self.refresh_after_calendar_closes(date_entry))
+            self.after(80, self._poll_calendar_closed, date_entry)
             return
-        self.refresh_history()
+        self.calendar_polls.discard(str(date_entry))
+        self.schedule_refresh("table")
 
     def update_range_controls_visibility(self):
         if self.period_var.get() == "select range":
@@ -86,35 +114,10 @@ class HistoryMixin:
         if period == "select range":
             self.from_enabled_var.set(True)
             self.to_enabled_var.set(True)
-            self.refresh_history()
+            self.schedule_refresh("table")
             return
 
-        if period == "today":
-            start = today
-            end = today
-        elif period == "this week":
-            start = today - timedelta(days=today.weekday())
-            end = start + timedelta(days=6)
-        elif period == "this month":
-            start = today.replace(day=1)
-            if start.month == 12:
-                nxt = start.replace(year=start.year + 1, month=1, day=1)
-            else:
-                nxt = start.replace(month=start.month + 1, day=1)
-            end = nxt - timedelta(days=1)
-        elif period == "last month":
-            first_this = today.replace(day=1)
-            end = first_this - timedelta(days=1)
-            start = end.replace(day=1)
-        elif period == "this year":
-            start = today.replace(month=1, day=1)
-            end = today.replace(month=12, day=31)
-        elif period == "last year":
-            start = today.replace(year=today.year - 1, month=1, day=1)
-            end = today.replace(year=today.year - 1, month=12, day=31)
-        else:
-            start = today
-            end = today
+        start, end = period_range(period, today)
 
         self.from_enabled_var.set(True)
         self.to_enabled_var.set(True)
@@ -122,60 +125,81 @@ class HistoryMixin:
         self.filter_to.set_date(end)
         self.from_last_value = self.filter_from.get().strip()
         self.to_last_value = self.filter_to.get().strip()
-        self.refresh_history()
-
-    def refresh_history(self):
-        for item in self.history_tree.get_children():
-            self.history_tree.delete(item)
+        self.schedule_refresh("table")
 
-        records = read_expenses()
+    def history_filter(self):
         from_date = self.parse_date_for_filter(self.filter_from.get()) if self.from_enabled_var.get() else None
         to_date = self.parse_date_for_filter(self.filter_to.get()) if self.to_enabled_var.get() else None
         selected_person = self.filter_person.get()
+        if not selected_person or selected_person == "All":
+            selected_person = None
+        return from_date, to_date, selected_person
+
+    def refresh_history(self, keep_position=False):
+        if not self.history_built:
+            return
+        if not self.ledger_ready:
+            self.history_summary.config(text="Loading\u2026")
+            self._start_ledger_load()
+            return
+        breakdown = instrumentation.begin("refresh")
+        from_date, to_date, selected_person = self.history_filter()
+        self.history_person = selected_person
+        self.selected_bucket = None
+        params = self.analytics_params()
+
+        self.dirty_parts.clear()
+        self.history_generation += 1
+        generation = self.history_generation
+        if self.history_future is not None:
+            self.history_future.cancel()
+        self.history_summary.config(text="Loading\u2026")
+        self.history_future = self.run_in_background(
+            self._query_history,
+            from_date,
+            to_date,
+            selected_person,
+            params,
+            breakdown,
+            on_done=lambda result: self._show_history(generation, result, breakdown, keep_position),
+            on_error=lambda error: self._history_failed(generation, error),
+        )
 
-        self.filtered_records = []
-        total_amount = Decimal("0.00")
+    def _history_failed(self, generation, error):
+        if generation != self.history_generation:
+            return
+        self.history_summary.config(text="Could not load history.")
+        self.show_background_error(error, "History")
+
+    def _query_history(self, from_date, to_date, selected_person, params, breakdown):
+        with instrumentation.recording(breakdown), instrumentation.capture("query"):
+            with instrumentation.timer("filter"):
+                lines = get_ledger().query(from_date, to_date, selected_person)
+                total_cents = sum(line.amount_cents for line in lines)
+            instrumentation.count("rows_matched", len(lines))
+            cache = {}
+            with instrumentation.timer("aggregate"):
+                analytics = self.compute_analytics(lines, params, cache)
+            get_ledger().warm_totals(params["grouping"], params["person"])
+        return lines, total_cents, analytics, cache
+
+    def _show_history(self, generation, result, breakdown, keep_position=False):
+        if generation != self.history_generation:
+            return
+        lines, total_cents, analytics, cache = result
 
-        for row in records:
-            row_date = self.parse_date_for_filter(row.get("date", ""))
-            if row_date is None:
-                continue
-            if from_date and row_date < from_date:
-                continue
-            if to_date and row_date > to_date:
-                continue
-            if selected_person and selected_person != "All" and row.get("person", "") != selected_person:
-                continue
+        with instrumentation.recording(breakdown), instrumentation.capture("render"):
+            self.filtered_records = lines
+            self.analytics_cache = cache
+            with instrumentation.timer("table"):
+                self.history_table.set_records(lines, keep_position)
 
-            try:
-                amount = parse_decimal(row.get("amount", "0"))
-            except (ValueError, InvalidOperation):
-                amount = Decimal("0.00")
-
-            total_amount += amount
-            self.filtered_records.append(row)
-
-            self.history_tree.insert(
-                "",
-                "end",
-                values=(
-                    row.get("date", ""),
-                    row.get("person", "Unknown"),
-                    row.get("store", ""),
-                    row.get("category", ""),
-                    row.get("sub_category", ""),
-                    row.get("amount", "0.00"),
-                    row.get("total", "0.00"),
-                    row.get("expense_id", ""),
-                ),
+            cur = self.settings.get("currency", "EUR")
+            self.history_summary.config(
+                text=f"Records: {len(lines)} | Total breakdown amount: {cents_to_str(total_cents)} {cur}"
             )
-
-        cur = self.settings.get("currency", "EUR")
-        self.history_summary.config(
-            text=f"Records: {len(self.filtered_records)} | Total breakdown amount: {decimal_to_str(total_amount)} {cur}"
-        )
-        self.selected_bucket = None
-        self.update_analytics(self.filtered_records)
+            self.apply_analytics(analytics)
+        self.report_timings(breakdown)
 
     def reset_history_filters(self):
         self.filter_person["values"] = ["All"] + self.people
@@ -199,7 +223,7 @@ class HistoryMixin:
         with open(file_path, "w", newline="", encoding="utf-8") as f:
             writer = csv.DictWriter(f, fieldnames=CSV_HEADERS)
             writer.writeheader()
-            writer.writerows(self.filtered_records)
+            writer.writerows(line.as_row() for line in self.filtered_records)
 
         self.set_status(f"Exported {len(self.filtered_records)} rows to {file_path}")
         messagebox.showinfo("Export", f"Exported {len(self.filtered_records)} rows.")
@@ -210,21 +234,20 @@ class HistoryMixin:
             messagebox.showerror("Edit", "Select a row first.")
             return
 
-        all_rows = read_expenses()
-        target_rows = [r for r in all_rows if r.get("expense_id", "") == expense_id]
+        target_rows = get_ledger().expense_lines(expense_id)
         if not target_rows:
             messagebox.showerror("Edit", "Expense not found.")
-            self.refresh_history()
+            self.refresh_history(keep_position=True)
             return
+        if get_ledger().id_collides(expense_id):
+            messagebox.showwarning(
+                "Edit",
+                f"Expense id {expense_id} is shared by lines of different expenses. "
+                f"Saving will replace all {len(target_rows)} lines.",
+            )
 
         first = target_rows[0]
-        lines = []
-        for row in target_rows:
-            try:
-                amount = parse_decimal(row.get("amount", "0"))
-            except (ValueError, InvalidOperation):
-                amount = Decimal("0.00")
-            lines.append((row.get("category", ""), row.get("sub_category", ""), amount))
+        lines = [(line.category, line.sub_category, line.amount) for line in target_rows]
 
         dialog = tk.Toplevel(self)
         dialog.title(f"Edit Expense {expense_id}")
@@ -236,20 +259,19 @@ class HistoryMixin:
         dialog.rowconfigure(2, weight=1)
 
         ttk.Label(dialog, text="Date").grid(row=0, column=0, sticky="w", padx=8, pady=6)
-        date_entry = DateEntry(dialog, date_pattern="dd.mm.yyyy")
-        parsed_date = self.parse_date_for_filter(first.get("date", ""))
-        if parsed_date:
-            date_entry.set_date(parsed_date)
+        date_entry = self.make_date_entry(dialog)
+        if first.date:
+            date_entry.set_date(first.date)
         date_entry.grid(row=0, column=1, sticky="ew", padx=(0, 8), pady=6)
 
         ttk.Label(dialog, text="Person").grid(row=0, column=2, sticky="w", padx=8, pady=6)
         person_cb = ttk.Combobox(dialog, values=self.people, state="readonly")
-        person_cb.set(first.get("person", ""))
+        person_cb.set(first.person)
         person_cb.grid(row=0, column=3, sticky="ew", padx=(0, 8), pady=6)
 
         ttk.Label(dialog, text="Store").grid(row=0, column=4, sticky="w", padx=8, pady=6)
         store_cb = ttk.Combobox(dialog, values=list(self.stores.keys()), state="readonly")
-        store_cb.set(first.get("store", ""))
+        store_cb.set(first.store)
         store_cb.grid(row=0, column=5, sticky="ew", padx=(0, 8), pady=6)
 
         line_tree = ttk.Treeview(dialog, columns=("cat", "sub", "amt"), show="headings", height=11)
@@ -336,7 +358,7 @@ class HistoryMixin:
                 return
 
             total = sum((line[2] for line in lines), Decimal("0.00"))
-            created_at = first.get("created_at", datetime.now().isoformat(timespec="seconds"))
+            created_at = first.created_at or datetime.now().isoformat(timespec="seconds")
             replacement = []
             for cat, sub, amount in lines:
                 replacement.append(
@@ -353,11 +375,9 @@ class HistoryMixin:
                     }
                 )
 
-            kept = [r for r in all_rows if r.get("expense_id", "") != expense_id]
-            kept.extend(replacement)
-            write_expenses(kept)
+            get_ledger().replace_expense(expense_id, replacement)
             dialog.destroy()
-            self.refresh_history()
+            self.refresh_history(keep_position=True)
             self.set_status(f"Updated expense {expense_id}.")
 
         ttk.Button(footer, text="Save changes", command=save_changes).pack(side="left", padx=4)
@@ -370,30 +390,95 @@ class HistoryMixin:
             messagebox.showerror("Delete", "Select a row first.")
             return
 
-        all_rows = read_expenses()
-        targets = [r for r in all_rows if r.get("expense_id", "") == expense_id]
+        targets = get_ledger().expense_lines(expense_id)
         if not targets:
-            self.refresh_history()
+            self.refresh_history(keep_position=True)
             return
 
+        shared = " Its id is shared by lines of different expenses." if get_ledger().id_collides(expense_id) else ""
         confirm = messagebox.askyesno(
             "Delete",
-            f"Delete expense {expense_id} ({len(targets)} lines)? This cannot be undone.",
+            f"Delete expense {expense_id} ({len(targets)} lines)?{shared} This cannot be undone.",
         )
         if not confirm:
             return
 
-        kept = [r for r in all_rows if r.get("expense_id", "") != expense_id]
-        write_expenses(kept)
-        self.refresh_history()
+        get_ledger().delete_expense(expense_id)
+        self.refresh_history(keep_position=True)
         self.set_status(f"Deleted expense {expense_id}.")
 
-    def update_analytics(self, rows):
-        formats = [self.settings.get("date_format", "%d.%m.%Y"), "%d.%m.%Y", "%Y-%m-%d", "%m/%d/%Y"]
-        dates = [self.parse_date_for_filter(r.get("date", "")) for r in rows]
-        dates = [d for d in dates if d]
+    def analytics_params(self):
+        return {
+            "from_date": self.parse_date_for_filter(self.filter_from.get()) if self.from_enabled_var.get() else None,
+            "to_date": self.parse_date_for_filter(self.filter_to.get()) if self.to_enabled_var.get() else None,
+            "mode": self.granularity_var.get(),
+            "grouping": self.grouping_var.get(),
+            "selected_bucket": self.selected_bucket,
+            "person": self.history_person,
+        }
+
+    def compute_analytics(self, rows, params, cache):
+        bars = self.compute_bars(rows, params, cache)
+        if bars is None:
+            return None
+        bars["pie_data"] = self.compute_pie(rows, params, bars, cache)
+        return bars
+
+    def compute_bars(self, rows, params, cache):
+        span = cache.get("span")
+        if span is None:
+            dates = [line.date for line in rows if line.date]
+            span = cache["span"] = (min(dates), max(dates)) if dates else ()
+        if not span:
+            return None
+
+        start = params["from_date"] or span[0]
+        end = params["to_date"] or span[1]
+
+        range_days = (end - start).days + 1
+        options = granularity_options(range_days)
+        mode = params["mode"] if params["mode"] in options else options[0]
+
+        key = ("bars", start, end, mode)
+        if key not in cache:
+            backend = get_ledger()
+            if backend.supports_aggregates:
+                cache[key] = aggregate_by_bucket_in(backend, start, end, mode, params["person"])
+            else:
+                cache[key] = aggregate_by_bucket(rows, start, end, mode)
+        buckets, labels, totals = cache[key]
+
+        selected_range = None
+        selected = params["selected_bucket"]
+        if selected is not None and 0 <= selected < len(buckets):
+            selected_range = buckets[selected]
+
+        return {
+            "start": start,
+            "end": end,
+            "range_days": range_days,
+            "options": options,
+            "mode": mode,
+            "buckets": buckets,
+            "labels": labels,
+            "totals": totals,
+            "selected_range": selected_range,
+        }
+
+    def compute_pie(self, rows, params, bars, cache):
+        pie_start, pie_end = bars["selected_range"] or (bars["start"], bars["end"])
+        key = ("pie", pie_start, pie_end, params["grouping"])
+        if key not in cache:
+            backend = get_ledger()
+            if backend.supports_aggregates:
+                cache[key] = aggregate_pie_in(backend, pie_start, pie_end, params["grouping"], params["person"])
+            else:
+                cache[key] = aggregate_pie(rows, pie_start, pie_end, params["grouping"])
+        return cache[key]
 
-        if not dates:
+    def apply_analytics(self, result):
+        self.analytics_result = result
+        if result is None:
             self.card_range_total.set("Range total: 0.00")
             self.card_range_days.set("Range days: 0")
             self.card_avg_day.set("Avg/day: 0.00")
@@ -404,54 +489,67 @@ class HistoryMixin:
             self.render_bar_chart([], [])
             self.render_pie_chart({})
             return
+        self.apply_bars(result)
+        self.apply_pie(result["pie_data"])
 
-        start = min(dates)
-        end = max(dates)
-        if self.from_enabled_var.get():
-            f = self.parse_date_for_filter(self.filter_from.get())
-            if f:
-                start = f
-        if self.to_enabled_var.get():
-            t = self.parse_date_for_filter(self.filter_to.get())
-            if t:
-                end = t
-
-        range_days = (end - start).days + 1
-        short_range = range_days < 60
-        options = ["day", "week_monday", "week_rolling", "month"] if short_range else ["week_monday", "week_rolling", "month"]
-
-        self.granularity_cb["values"] = options
-        if self.granularity_var.get() not in options:
-            self.granularity_var.set(options[0])
-
-        mode = self.granularity_var.get()
-        buckets, labels, totals = aggregate_by_bucket(rows, start, end, mode, formats)
-        self.bucket_ranges = buckets
+    def redraw_analytics(self, parts):
+        result = self.analytics_result
+        if result is None:
+            self.apply_analytics(None)
+            return
+        breakdown = instrumentation.begin("redraw")
+        rows = self.filtered_records
+        params = self.analytics_params()
+        with instrumentation.recording(breakdown):
+            with instrumentation.timer("aggregate"):
+                if "bars" in parts:
+                    bars = self.compute_bars(rows, params, self.analytics_cache)
+                    if bars is not None:
+                        bars["pie_data"] = result["pie_data"]
+                    result = bars
+                if result is not None and "pie" in parts:
+                    result["pie_data"] = self.compute_pie(rows, params, result, self.analytics_cache)
+            if result is None:
+                self.apply_analytics(None)
+            else:
+                self.analytics_result = result
+                if "bars" in parts:
+                    self.apply_bars(result)
+                if "pie" in parts:
+                    self.apply_pie(result["pie_data"])
+        self.report_timings(breakdown)
+
+    def apply_bars(self, result):
+        self.granularity_cb["values"] = result["options"]
+        if self.granularity_var.get() != result["mode"]:
+            self.granularity_var.set(result["mode"])
+
+        labels, totals = result["labels"], result["totals"]
+        self.bucket_ranges = result["buckets"]
         self.bucket_labels = labels
         self.bucket_totals = totals
 
         currency = self.settings.get("currency", "EUR")
+        range_days = result["range_days"]
         total_sum = sum(totals, Decimal("0.00"))
         avg_day = total_sum / Decimal(range_days) if range_days else Decimal("0.00")
         self.card_range_total.set(f"Range total: {decimal_to_str(total_sum)} {currency}")
         self.card_range_days.set(f"Range days: {range_days}")
         self.card_avg_day.set(f"Avg/day: {decimal_to_str(avg_day)} {currency}")
 
-        bucket_start, bucket_end = start, end
-        has_selected_bucket = self.selected_bucket is not None and 0 <= self.selected_bucket < len(buckets)
-        if has_selected_bucket:
-            bucket_start, bucket_end = buckets[self.selected_bucket]
+        if result["selected_range"]:
+            bucket_start, bucket_end = result["selected_range"]
             self.bucket_label_var.set(
                 f"Selected bucket: {bucket_start.strftime('%d.%m.%Y')} - {bucket_end.strftime('%d.%m.%Y')}"
             )
         else:
             self.bucket_label_var.set("Selected bucket: whole range")
 
-        pie_start, pie_end = start, end
-        if has_selected_bucket:
-            pie_start, pie_end = bucket_start, bucket_end
+        with instrumentation.timer("bars"):
+            self.render_bar_chart(labels, totals)
 
-        pie_data = aggregate_pie(rows, pie_start, pie_end, self.grouping_var.get(), formats)
+    def apply_pie(self, pie_data):
+        currency = self.settings.get("currency", "EUR")
         if pie_data:
             top_key = max(pie_data, key=pie_data.get)
             self.card_top_group.set(f"Top group: {top_key} ({decimal_to_str(pie_data[top_key])} {currency})")
@@ -460,17 +558,19 @@ class HistoryMixin:
         if self.selected_pie_label and self.selected_pie_label not in pie_data:
             self.selected_pie_label = None
 
-        self.render_bar_chart(labels, totals)
-        self.render_pie_chart(pie_data)
+        with instrumentation.timer("pie"):
+            self.render_pie_chart(pie_data)
 
     def render_bar_chart(self, labels, totals):
         canvas = self.chart_canvas
-        canvas.delete("all")
+        pool = self.chart_pool
+        pool.begin()
         width = max(canvas.winfo_width(), 600)
         height = max(canvas.winfo_height(), 170)
 
         if not labels:
-            canvas.create_text(width // 2, height // 2, text="No data for chart", fill="#666")
+            pool.draw("empty", "text", (width // 2, height // 2), text="No data for chart", fill="#666")
+            pool.finish()
             return
 
         max_val = max(totals) if totals else Decimal("1")
@@ -483,7 +583,7 @@ class HistoryMixin:
         step = chart_w / len(labels)
         bar_w = max(20, int(step * 0.6))
 
-        canvas.create_line(left, height - bottom, width - right, height - bottom, fill="#bbbbbb")
+        pool.draw("axis", "line", (left, height - bottom, width - right, height - bottom), fill="#bbbbbb")
         for idx, label in enumerate(labels):
             value = totals[idx]
             bar_h = int(chart_h * float(value / max_val))
@@ -491,25 +591,26 @@ class HistoryMixin:
             x1, x2 = x_center - bar_w // 2, x_center + bar_w // 2
             y1, y2 = height - bottom - bar_h, height - bottom
             fill = "#2d8cff" if self.selected_bucket == idx else "#5aa5ff"
-            canvas.create_rectangle(x1, y1, x2, y2, fill=fill, outline="")
-            canvas.create_text(x_center, y1 - 8, text=decimal_to_str(value), font=("Segoe UI", 8), fill="#1f4d8f")
-            canvas.create_text(x_center, height - 12, text=label, font=("Segoe UI", 8), fill="#444")
+            pool.draw("bar", "rectangle", (x1, y1, x2, y2), fill=fill, outline="")
+            pool.draw(
+                "value", "text", (x_center, y1 - 8), text=decimal_to_str(value), font=("Segoe UI", 8), fill="#1f4d8f"
+            )
+            pool.draw("label", "text", (x_center, height - 12), text=label, font=("Segoe UI", 8), fill="#444")
+        pool.finish()
 
     def render_pie_chart(self, pie_data):
         canvas = self.pie_canvas
-        canvas.delete("all")
+        pool = self.pie_pool
+        pool.begin()
         width = max(canvas.winfo_width(), 240)
         height = max(canvas.winfo_height(), 170)
         self.pie_slices = []
         self.pie_geometry = None
 
-        if not pie_data:
-            canvas.create_text(width // 2, height // 2, text="No data for pie", fill="#666")
-            return
-
         total = sum(pie_data.values(), Decimal("0.00"))
-        if total <= 0:
-            canvas.create_text(width // 2, height // 2, text="No data for pie", fill="#666")
+        if not pie_data or total <= 0:
+            pool.draw("empty", "text", (width // 2, height // 2), text="No data for pie", fill="#666")
+            pool.finish()
             return
 
         colors = ["#2d8cff", "#8bc34a", "#ff9800", "#e91e63", "#9c27b0", "#00bcd4", "#795548", "#607d8b"]
@@ -527,11 +628,10 @@ class HistoryMixin:
             extent = float(value / total) * 360
             color = colors[idx % len(colors)]
             is_selected = key == self.selected_pie_label
-            canvas.create_arc(
-                cx - radius,
-                cy - radius,
-                cx + radius,
-                cy + radius,
+            pool.draw(
+                "slice",
+                "arc",
+                (cx - radius, cy - radius, cx + radius, cy + radius),
                 start=start,
                 extent=extent,
                 fill=color,
@@ -549,10 +649,11 @@ class HistoryMixin:
             )
             pct = (value / total) * Decimal("100")
             y = legend_y + (idx * 18)
-            canvas.create_rectangle(legend_x, y, legend_x + 10, y + 10, fill=color, outline="")
-            canvas.create_text(
-                legend_x + 16,
-                y + 5,
+            pool.draw("swatch", "rectangle", (legend_x, y, legend_x + 10, y + 10), fill=color, outline="")
+            pool.draw(
+                "legend",
+                "text",
+                (legend_x + 16, y + 5),
                 anchor="w",
                 text=f"{key}: {decimal_to_str(value)} ({decimal_to_str(pct)}%)",
                 font=("Segoe UI", 8),
@@ -561,9 +662,10 @@ class HistoryMixin:
             start += extent
 
         self.pie_geometry = {"cx": cx, "cy": cy, "radius": radius}
-        self._draw_pie_selection_text(canvas, width, height, total)
+        self._draw_pie_selection_text(pool, width, height, total)
+        pool.finish()
 
-    def _draw_pie_selection_text(self, canvas, width, height, total):
+    def _draw_pie_selection_text(self, pool, width, height, total):
         if not self.selected_pie_label or not self.pie_slices:
             return
 
@@ -577,9 +679,10 @@ class HistoryMixin:
 
         pct = (selected["value"] / total) * Decimal("100")
         text = f"{selected['label']}: {decimal_to_str(selected['value'])} ({decimal_to_str(pct)}%)"
-        canvas.create_text(
-            width - 8,
-            height - 8,
+        pool.draw(
+            "selection",
+            "text",
+            (width - 8, height - 8),
             anchor="se",
             text=text,
             font=("Segoe UI", 8, "bold"),
@@ -617,7 +720,7 @@ class HistoryMixin:
             self.selected_bucket = clicked_idx
         else:
             self.selected_bucket = None
-        self.update_analytics(self.filtered_records)
+        self.schedule_refresh("bars", "pie")
 
     def on_pie_click(self, event):
         if not self.pie_geometry or not self.pie_slices:
@@ -630,7 +733,7 @@ class HistoryMixin:
         dy = event.y - cy
         if (dx * dx + dy * dy) > (radius * radius):
             self.selected_pie_label = None
-            self.update_analytics(self.filtered_records)
+            self.schedule_refresh("pie")
             return
 
         angle = math.degrees(math.atan2(-dy, dx))
@@ -642,11 +745,11 @@ class HistoryMixin:
             end = start + seg["extent"]
             if start <= angle < end:
                 self.selected_pie_label = seg["label"]
-                self.update_analytics(self.filtered_records)
+                self.schedule_refresh("pie")
                 return
 
         self.selected_pie_label = None
-        self.update_analytics(self.filtered_records)
+        self.schedule_refresh("pie")
 
     def on_pie_wheel(self, event):
         delta = 0
@@ -659,11 +762,11 @@ class HistoryMixin:
         if delta == 0:
             return
         self.pie_zoom = min(2.5, max(0.6, self.pie_zoom + (0.1 * delta)))
-        self.update_analytics(self.filtered_records)
+        self.schedule_refresh("pie")
 
     def set_pie_zoom(self, value):
         self.pie_zoom = min(2.5, max(0.6, value))
-        self.update_analytics(self.filtered_records)
+        self.schedule_refresh("pie")
 
     def build_history_tab(self):
         f = self.tab_history
@@ -677,15 +780,7 @@ class HistoryMixin:
             f,
             textvariable=self.period_var,
             state="readonly",
-            values=[
-                "this month",
-                "last month",
-                "today",
-                "this week",
-                "this year",
-                "last year",
-                "select range",
-            ],
+            values=PERIODS + ["select range"],
         )
         self.period_cb.grid(row=0, column=1, sticky="ew", padx=(0, 10), pady=4)
 
@@ -700,7 +795,7 @@ class HistoryMixin:
 
         ttk.Label(self.range_frame, text="From").grid(row=0, column=0, sticky="w", padx=6, pady=4)
         self.from_var = tk.StringVar()
-        self.filter_from = DateEntry(self.range_frame, date_pattern="dd.mm.yyyy", textvariable=self.from_var)
+        self.filter_from = self.make_date_entry(self.range_frame, textvariable=self.from_var)
         self.filter_from.grid(row=0, column=1, sticky="ew", padx=(0, 10), pady=4)
         self._install_calendar_focus_guard(self.filter_from)
         if getattr(self.filter_from, "_calendar", None) is not None:
@@ -708,7 +803,7 @@ class HistoryMixin:
 
         ttk.Label(self.range_frame, text="To").grid(row=0, column=3, sticky="w", padx=6, pady=4)
         self.to_var = tk.StringVar()
-        self.filter_to = DateEntry(self.range_frame, date_pattern="dd.mm.yyyy", textvariable=self.to_var)
+        self.filter_to = self.make_date_entry(self.range_frame, textvariable=self.to_var)
         self.filter_to.grid(row=0, column=4, sticky="ew", padx=(0, 10), pady=4)
         self._install_calendar_focus_guard(self.filter_to)
         if getattr(self.filter_to, "_calendar", None) is not None:
@@ -738,6 +833,9 @@ class HistoryMixin:
         cols = ("date", "person", "store", "category", "sub", "amount", "total", "id")
         self.history_tree = ttk.Treeview(f, columns=cols, show="headings", height=14)
         self.history_tree.grid(row=4, column=0, columnspan=7, sticky="nsew")
+        history_scroll = ttk.Scrollbar(f, orient="vertical")
+        history_scroll.grid(row=4, column=7, sticky="ns")
+        self.history_table = VirtualTable(self.history_tree, history_scroll, self.history_row_values)
 
         self.history_tree.heading("date", text="Date")
         self.history_tree.heading("person", text="Person")
@@ -797,9 +895,9 @@ class HistoryMixin:
         self.bucket_label_var = tk.StringVar(value="Selected bucket: whole range")
         ttk.Label(analytics, textvariable=self.bucket_label_var).grid(row=4, column=0, columnspan=4, sticky="w")
 
-        self.chart_canvas.bind("<Configure>", lambda _: self.update_analytics(self.filtered_records))
+        self.chart_canvas.bind("<Configure>", lambda _: self.schedule_refresh("bars"))
         self.chart_canvas.bind("<Button-1>", self.on_chart_click)
-        self.pie_canvas.bind("<Configure>", lambda _: self.update_analytics(self.filtered_records))
+        self.pie_canvas.bind("<Configure>", lambda _: self.schedule_refresh("pie"))
         self.pie_canvas.bind("<Button-1>", self.on_pie_click)
         self.pie_canvas.bind("<MouseWheel>", self.on_pie_wheel)
         self.pie_canvas.bind("<Button-4>", self.on_pie_wheel)
@@ -808,16 +906,23 @@ class HistoryMixin:
         self.filter_from.bind("<Return>", self.on_from_typed)
         self.filter_to.bind("<Return>", self.on_to_typed)
         self.period_cb.bind("<<ComboboxSelected>>", lambda _e: self.apply_period_preset())
-        self.filter_person.bind("<<ComboboxSelected>>", lambda _e: self.refresh_history())
-        self.grouping_cb.bind("<<ComboboxSelected>>", lambda _e: self.update_analytics(self.filtered_records))
-        self.granularity_cb.bind("<<ComboboxSelected>>", lambda _e: self.update_analytics(self.filtered_records))
+        self.filter_person.bind("<<ComboboxSelected>>", lambda _e: self.schedule_refresh("table"))
+        self.grouping_cb.bind("<<ComboboxSelected>>", lambda _e: self.schedule_refresh("pie"))
+        self.granularity_cb.bind("<<ComboboxSelected>>", lambda _e: self.schedule_refresh("bars", "pie"))
 
         self.selected_bucket = None
         self.selected_pie_label = None
         self.pie_slices = []
         self.pie_geometry = None
         self.pie_zoom = 1.0
+        self.history_person = None
+        self.analytics_result = None
+        self.analytics_cache = {}
+        self.chart_pool = CanvasPool(self.chart_canvas)
+        self.pie_pool = CanvasPool(self.pie_canvas)
+        self.calendar_polls = set()
         self.from_last_value = self.from_var.get()
         self.to_last_value = self.to_var.get()
+        self.history_built = True
 
         self.apply_period_preset()
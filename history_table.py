@@ -0,0 +1,166 @@
+from tkinter import ttk
+
+import instrumentation
+
+
+DEFAULT_ROW_HEIGHT = 20
+
+
+class VirtualTable:
+    def __init__(self, tree, scrollbar, format_row):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.format_row = format_row
+        self.records = []
+        self.offset = 0
+        self.items = []
+        self.values = {}
+        self.visible_rows = int(tree.cget("height"))
+        self.selected_index = None
+
+        scrollbar.configure(command=self.on_scrollbar)
+        tree.bind("<MouseWheel>", self.on_wheel)
+        tree.bind("<Button-4>", self.on_wheel)
+        tree.bind("<Button-5>", self.on_wheel)
+        tree.bind("<Configure>", self.on_resize)
+        tree.bind("<<TreeviewSelect>>", self.on_select)
+        tree.bind("<Up>", lambda _e: self.move_selection(-1))
+        tree.bind("<Down>", lambda _e: self.move_selection(1))
+        tree.bind("<Prior>", lambda _e: self.move_selection(-self.visible_rows))
+        tree.bind("<Next>", lambda _e: self.move_selection(self.visible_rows))
+
+    def set_records(self, records, keep_position=False):
+        selected_key = None
+        if keep_position and self.selected_index is not None:
+            pos = self.selected_index - self.offset
+            if 0 <= pos < len(self.items):
+                selected_key = self.items[pos]
+        self.records = records
+        self.selected_index = None
+        if not keep_position:
+            self.offset = 0
+        self.render()
+        if selected_key in self.items:
+            self.selected_index = self.offset + self.items.index(selected_key)
+            self._sync_selection()
+
+    def record_key(self, index):
+        expense_id = self.records[index].expense_id
+        line_no = 0
+        while index - line_no > 0 and self.records[index - line_no - 1].expense_id == expense_id:
+            line_no += 1
+        return f"{expense_id}#{line_no}"
+
+    def max_offset(self):
+        return max(0, len(self.records) - self.visible_rows)
+
+    def scroll_to(self, offset):
+        offset = max(0, min(int(offset), self.max_offset()))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+
+    def render(self):
+        self.offset = min(self.offset, self.max_offset())
+        count = min(self.visible_rows, len(self.records) - self.offset)
+        wanted = {}
+        for idx in range(self.offset, self.offset + count):
+            key = self.record_key(idx)
+            while key in wanted:
+                key += "+"
+            wanted[key] = self.format_row(self.records[idx])
+
+        stale = [iid for iid in self.items if iid not in wanted]
+        if stale:
+            self.tree.delete(*stale)
+            instrumentation.count("tcl_ops")
+            for iid in stale:
+                del self.values[iid]
+        current = [iid for iid in self.items if iid in wanted]
+
+        for pos, (key, values) in enumerate(wanted.items()):
+            if key not in self.values:
+                self.tree.insert("", pos, iid=key, values=values)
+                instrumentation.count("tcl_ops")
+                current.insert(pos, key)
+                self.values[key] = values
+                continue
+            if current[pos] != key:
+                self.tree.move(key, "", pos)
+                instrumentation.count("tcl_ops")
+                current.remove(key)
+                current.insert(pos, key)
+            if self.values[key] != values:
+                self.tree.item(key, values=values)
+                instrumentation.count("tcl_ops")
+                self.values[key] = values
+        self.items = current
+        self._sync_selection()
+        self._sync_scrollbar()
+
+    def _sync_selection(self):
+        pos = None if self.selected_index is None else self.selected_index - self.offset
+        if pos is not None and 0 <= pos < len(self.items):
+            if self.tree.selection() != (self.items[pos],):
+                self.tree.selection_set(self.items[pos])
+        elif self.tree.selection():
+            self.tree.selection_set(())
+
+    def _sync_scrollbar(self):
+        total = len(self.records)
+        if not total:
+            self.scrollbar.set(0.0, 1.0)
+            return
+        self.scrollbar.set(self.offset / total, min(1.0, (self.offset + len(self.items)) / total))
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(float(amount) * len(self.records))
+        elif action == "scroll":
+            step = self.visible_rows if unit == "pages" else 1
+            self.scroll_to(self.offset + int(amount) * step)
+
+    def on_wheel(self, event):
+        if getattr(event, "num", None) == 4:
+            delta = -3
+        elif getattr(event, "num", None) == 5:
+            delta = 3
+        else:
+            delta = -3 if event.delta > 0 else 3
+        self.scroll_to(self.offset + delta)
+        return "break"
+
+    def on_resize(self, event):
+        bbox = self.tree.bbox(self.items[0]) if self.items else None
+        if bbox:
+            top, row_height = bbox[1], bbox[3]
+        else:
+            row_height = int(ttk.Style().lookup("Treeview", "rowheight") or DEFAULT_ROW_HEIGHT)
+            top = row_height
+        rows = max(1, (event.height - top) // max(1, row_height))
+        if rows != self.visible_rows:
+            self.visible_rows = rows
+            self.render()
+
+    def on_select(self, _event=None):
+        selected = self.tree.selection()
+        if selected and selected[0] in self.items:
+            self.selected_index = self.offset + self.items.index(selected[0])
+
+    def move_selection(self, step):
+        if not self.records:
+            return "break"
+        current = self.offset if self.selected_index is None else self.selected_index + step
+        self.selected_index = max(0, min(current, len(self.records) - 1))
+        if self.selected_index < self.offset:
+            self.offset = self.selected_index
+        elif self.selected_index >= self.offset + self.visible_rows:
+            self.offset = self.selected_index - self.visible_rows + 1
+        self.render()
+        self.tree.focus(self.items[self.selected_index - self.offset])
+        return "break"
+
+    def selected_record(self):
+        if self.selected_index is None or self.selected_index >= len(self.records):
+            return None
+        return self.records[self.selected_index]
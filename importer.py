@@ -0,0 +1,240 @@
+import argparse
+import csv
+import sys
+from datetime import datetime
+from decimal import InvalidOperation
+from itertools import islice
+
+from data_store import (
+    CSV_HEADERS,
+    DATE_FORMATS,
+    DEFAULT_DATA,
+    ensure_expense_file,
+    load_json,
+    open_backend,
+)
+from utils import decimal_to_str, parse_date, parse_decimal
+
+
+BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 20
+
+COLUMN_ALIASES = {
+    "date": ["date", "datum", "booking date", "transaction date", "value date"],
+    "person": ["person", "owner", "account holder"],
+    "store": ["store", "merchant", "payee", "shop", "counterparty", "description"],
+    "total": ["total", "receipt total"],
+    "category": ["category"],
+    "sub_category": ["sub_category", "subcategory", "sub category"],
+    "amount": ["amount", "betrag", "value", "sum"],
+    "expense_id": ["expense_id", "receipt", "receipt id", "transaction id"],
+    "created_at": ["created_at"],
+}
+
+
+def sniff_delimiter(path, encoding="utf-8-sig"):
+    with open(path, "r", newline="", encoding=encoding) as f:
+        sample = f.read(64 * 1024)
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=",;\t|").delimiter
+    except csv.Error:
+        return ","
+
+
+def read_rows(path, delimiter=None, encoding="utf-8-sig"):
+    delimiter = delimiter or sniff_delimiter(path, encoding)
+    with open(path, "r", newline="", encoding=encoding) as f:
+        yield from csv.DictReader(f, delimiter=delimiter)
+
+
+def resolve_mapping(fieldnames, mapping=None):
+    mapping = dict(mapping or {})
+    available = {name.strip().lower(): name for name in fieldnames if name}
+    for header in CSV_HEADERS:
+        if header in mapping:
+            continue
+        for alias in COLUMN_ALIASES[header]:
+            if alias in available:
+                mapping[header] = available[alias]
+                break
+    return mapping
+
+
+def map_columns(rows, mapping=None):
+    resolved = None
+    for row in rows:
+        if resolved is None:
+            resolved = resolve_mapping(row.keys(), mapping)
+        yield {header: (row.get(resolved[header]) or "").strip() if header in resolved else "" for header in CSV_HEADERS}
+
+
+def apply_defaults(rows, stores, person=""):
+    for row in rows:
+        if not row["person"]:
+            row["person"] = person or "Unknown"
+        defaults = stores.get(row["store"], {})
+        if not row["category"]:
+            row["category"] = defaults.get("category", "")
+            if not row["sub_category"]:
+                row["sub_category"] = defaults.get("sub", "")
+        yield row
+
+
+def validate(rows, report, date_formats=DATE_FORMATS, negate=False):
+    for line_no, row in enumerate(rows, 2):
+        try:
+            amount = parse_decimal(row["amount"])
+            if negate:
+                amount = -amount
+            if amount <= 0:
+                raise InvalidOperation
+        except (ValueError, InvalidOperation):
+            _reject(report, line_no, f"invalid amount {row['amount']!r}")
+            continue
+        try:
+            total = parse_decimal(row["total"]) if row["total"] else None
+        except (ValueError, InvalidOperation):
+            _reject(report, line_no, f"invalid total {row['total']!r}")
+            continue
+        parsed = parse_date(row["date"], date_formats)
+        if parsed is None:
+            _reject(report, line_no, f"invalid date {row['date']!r}")
+            continue
+        row["date"] = parsed.strftime(date_formats[0])
+        row["amount"] = decimal_to_str(amount)
+        row["total"] = decimal_to_str(total) if total is not None else ""
+        yield row
+
+
+def _reject(report, line_no, message):
+    report["skipped"] += 1
+    if len(report["errors"]) < MAX_REPORTED_ERRORS:
+        report["errors"].append(f"line {line_no}: {message}")
+
+
+def group_expenses(rows):
+    group = []
+    for row in rows:
+        if group and (not row["expense_id"] or row["expense_id"] != group[0]["expense_id"]):
+            yield group
+            group = []
+        group.append(row)
+    if group:
+        yield group
+
+
+def assign_ids(groups, ids):
+    created_at = datetime.now().isoformat(timespec="seconds")
+    for group in groups:
+        expense_id = next(ids)
+        total = decimal_to_str(sum(parse_decimal(row["amount"]) for row in group))
+        for row in group:
+            row["expense_id"] = expense_id
+            if not row["total"]:
+                row["total"] = total
+            if not row["created_at"]:
+                row["created_at"] = created_at
+            yield row
+
+
+def batched(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def import_csv(
+    path,
+    backend,
+    mapping=None,
+    stores=None,
+    person="",
+    delimiter=None,
+    negate=False,
+    batch_size=BATCH_SIZE,
+    progress=None,
+):
+    report = {"imported": 0, "skipped": 0, "errors": [], "failed": None}
+    if stores is None:
+        stores = load_json("stores", DEFAULT_DATA)
+    rows = read_rows(path, delimiter)
+    rows = map_columns(rows, mapping)
+    rows = apply_defaults(rows, stores, person)
+    rows = validate(rows, report, backend.date_formats, negate)
+    rows = assign_ids(group_expenses(rows), backend.new_expense_ids())
+    try:
+        for batch in batched(rows, batch_size):
+            backend.append(batch)
+            report["imported"] += len(batch)
+            if progress is not None:
+                progress(report["imported"], report["skipped"])
+    except UnicodeDecodeError as exc:
+        report["failed"] = f"{path} is not UTF-8 text ({exc.reason} at byte {exc.start})"
+    except csv.Error as exc:
+        report["failed"] = f"{path} is not a readable CSV file ({exc})"
+    except OSError as exc:
+        report["failed"] = str(exc)
+    return report
+
+
+def _parse_mapping(pairs):
+    mapping = {}
+    for pair in pairs:
+        header, _, column = pair.partition("=")
+        if header not in CSV_HEADERS or not column:
+            raise argparse.ArgumentTypeError(f"invalid mapping {pair!r}, expected <{'|'.join(CSV_HEADERS)}>=<column>")
+        mapping[header] = column
+    return mapping
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import expenses from a bank or receipt CSV export.")
+    parser.add_argument("path")
+    parser.add_argument("--map", action="append", default=[], metavar="HEADER=COLUMN")
+    parser.add_argument("--person", default="")
+    parser.add_argument("--delimiter")
+    parser.add_argument("--negate", action="store_true", help="flip signs, for exports that list spending as negative")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--backend", choices=["csv", "sqlite"], default=None)
+    args = parser.parse_args(argv)
+
+    try:
+        mapping = _parse_mapping(args.map)
+    except argparse.ArgumentTypeError as exc:
+        parser.error(str(exc))
+
+    settings = load_json("settings", DEFAULT_DATA)
+    ensure_expense_file()
+    backend = open_backend(
+        args.backend or settings.get("storage_backend", "csv"),
+        settings.get("date_format", DATE_FORMATS[0]),
+    )
+
+    def progress(imported, skipped):
+        print(f"\rimported {imported}, skipped {skipped}", end="", file=sys.stderr, flush=True)
+
+    report = import_csv(
+        args.path,
+        backend,
+        mapping=mapping,
+        person=args.person,
+        delimiter=args.delimiter,
+        negate=args.negate,
+        batch_size=args.batch_size,
+        progress=progress,
+    )
+    print(file=sys.stderr)
+    for error in report["errors"]:
+        print(error, file=sys.stderr)
+    print(f"Imported {report['imported']} lines, skipped {report['skipped']} from {args.path}")
+    if report["failed"]:
+        print(f"Import stopped: {report['failed']}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+
+PROFILE_MODES = ("cprofile", "tracemalloc")
+
+_config = {"enabled": False, "profile": None, "profile_dir": "data"}
+_active = threading.local()
+_tracing = {"open": 0}
+_tracing_lock = threading.Lock()
+_last = None
+
+
+def configure(settings):
+    config = settings.get("instrumentation") or {}
+    profile = config.get("profile")
+    _config["enabled"] = bool(config.get("enabled", False))
+    _config["profile"] = profile if profile in PROFILE_MODES else None
+    _config["profile_dir"] = config.get("profile_dir", "data")
+
+
+def enabled():
+    return _config["enabled"]
+
+
+def begin(label):
+    if not _config["enabled"]:
+        return None
+    breakdown = {"label": label, "started": time.perf_counter(), "timings": {}, "counters": {}}
+    if _config["profile"] == "tracemalloc":
+        import tracemalloc
+
+        with _tracing_lock:
+            if not _tracing["open"]:
+                if tracemalloc.is_tracing():
+                    tracemalloc.reset_peak()
+                else:
+                    tracemalloc.start()
+            _tracing["open"] += 1
+        breakdown["traced"] = True
+    return breakdown
+
+
+def finish(breakdown):
+    global _last
+    if breakdown is None or "started" not in breakdown:
+        return None
+    breakdown["total"] = time.perf_counter() - breakdown.pop("started")
+    if breakdown.pop("traced", False):
+        import tracemalloc
+
+        with _tracing_lock:
+            breakdown["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+            _tracing["open"] -= 1
+            if not _tracing["open"]:
+                tracemalloc.stop()
+    _last = breakdown
+    return breakdown
+
+
+def last():
+    return _last
+
+
+@contextmanager
+def recording(breakdown):
+    previous = getattr(_active, "breakdown", None)
+    _active.breakdown = breakdown
+    try:
+        yield breakdown
+    finally:
+        _active.breakdown = previous
+
+
+def _record(kind, name, value):
+    breakdown = getattr(_active, "breakdown", None)
+    if breakdown is not None:
+        values = breakdown[kind]
+        values[name] = values.get(name, 0) + value
+
+
+def count(name, value=1):
+    if _config["enabled"]:
+        _record("counters", name, value)
+
+
+@contextmanager
+def _timed(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record("timings", name, time.perf_counter() - started)
+
+
+def timer(name):
+    if not _config["enabled"]:
+        return nullcontext()
+    return _timed(name)
+
+
+@contextmanager
+def _profiled(label):
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        os.makedirs(_config["profile_dir"], exist_ok=True)
+        profiler.dump_stats(os.path.join(_config["profile_dir"], f"profile-{label}.prof"))
+
+
+def capture(label):
+    if not _config["enabled"] or _config["profile"] != "cprofile":
+        return nullcontext()
+    return _profiled(label)
+
+
+def format_breakdown(breakdown):
+    if breakdown is None:
+        return ""
+    parts = [f"{breakdown['label']} {breakdown['total'] * 1000:.1f} ms"]
+    timings = breakdown["timings"]
+    if timings:
+        parts.append(" · ".join(f"{name} {seconds * 1000:.1f}" for name, seconds in timings.items()))
+    counters = breakdown["counters"]
+    if counters:
+        parts.append(" ".join(f"{name} {value}" for name, value in counters.items()))
+    if "peak_bytes" in breakdown:
+        parts.append(f"peak {breakdown['peak_bytes'] / 1024:.0f} KiB")
+    return " | ".join(parts)
@@ -0,0 +1,589 @@
+import csv
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from datetime import date
+from hashlib import blake2b
+from heapq import merge
+from itertools import accumulate, chain, islice
+
+from data_store import CSV_HEADERS, DATE_SAMPLE_SIZE, ExpenseLine, _shares_id, atomic_write
+from utils import detect_date_format, prefer_format
+
+
+INDEX_MAGIC = b"EXPIDX\x00\x00"
+INDEX_VERSION = 2
+HEADER = struct.Struct("<8sB3xIqqq16s16s")
+SECTION = struct.Struct("<c7xQ")
+SECTION_ALIGN = 8
+SAMPLE_BYTES = 64 * 1024
+DIGEST_CHUNK_BYTES = 1024 * 1024
+NATIVE_LITTLE = sys.byteorder == "little"
+
+
+def index_path_for(path):
+    return f"{path}.idx"
+
+
+def record_end(mm, pos, size):
+    end = mm.find(b"\n", pos)
+    if end < 0:
+        end = size
+    if mm.find(b'"', pos, end) < 0:
+        return end
+    quotes = mm[pos:end].count(b'"')
+    while quotes % 2 and end < size:
+        nxt = mm.find(b"\n", end + 1)
+        if nxt < 0:
+            nxt = size
+        quotes += mm[end + 1:nxt].count(b'"')
+        end = nxt
+    return end
+
+
+def record_offsets(path):
+    offsets = array("Q")
+    with open(path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return offsets
+        with mm:
+            size = len(mm)
+            pos = record_end(mm, 0, size) + 1
+            while pos < size:
+                end = record_end(mm, pos, size)
+                if end - pos > 1:
+                    offsets.append(pos)
+                pos = end + 1
+    return offsets
+
+
+def read_records(f, start=0):
+    f.seek(start)
+    position = start
+
+    def physical_lines():
+        nonlocal position
+        for raw in f:
+            position += len(raw)
+            yield raw.decode("utf-8")
+
+    reader = csv.reader(physical_lines())
+    while True:
+        offset = position
+        values = next(reader, None)
+        if values is None:
+            return
+        if values:
+            yield offset, values
+
+
+def _sample_digest(f, size):
+    digest = blake2b(digest_size=16)
+    f.seek(0)
+    digest.update(f.read(min(size, SAMPLE_BYTES)))
+    tail_start = max(0, size - SAMPLE_BYTES)
+    f.seek(tail_start)
+    digest.update(f.read(size - tail_start))
+    return digest.digest()
+
+
+def _file_digest(f, size):
+    digest = blake2b(digest_size=16)
+    f.seek(0)
+    remaining = size
+    while remaining:
+        chunk = f.read(min(remaining, DIGEST_CHUNK_BYTES))
+        if not chunk:
+            break
+        digest.update(chunk)
+        remaining -= len(chunk)
+    return digest.digest()
+
+
+def _owned(values):
+    if isinstance(values, array):
+        return values
+    owned = array(values.format)
+    owned.frombytes(values.cast("B"))
+    return owned
+
+
+def _format_key(formats):
+    return list(dict.fromkeys(formats))
+
+
+def _values_to_line(values, parse_formats):
+    return ExpenseLine.from_row(dict(zip(CSV_HEADERS, values)), parse_formats)
+
+
+class StringColumn:
+    def __init__(self, text="", ends=None):
+        self.text = text
+        self.ends = ends if ends is not None else array("I")
+        self.pending = []
+
+    def __len__(self):
+        return len(self.ends)
+
+    def append(self, value):
+        self.pending.append(value)
+        self.ends.append((self.ends[-1] if self.ends else 0) + len(value))
+
+    def extend(self, values):
+        self.pending.extend(values)
+        self.ends.extend(islice(accumulate(map(len, values), initial=self.ends[-1] if self.ends else 0), 1, None))
+
+    def _flush(self):
+        if self.pending:
+            self.text += "".join(self.pending)
+            self.pending = []
+
+    def __getitem__(self, pos):
+        self._flush()
+        return self.text[self.ends[pos - 1] if pos else 0:self.ends[pos]]
+
+    def values(self):
+        self._flush()
+        text = self.text
+        return [text[start:end] for start, end in zip(chain((0,), self.ends), self.ends)]
+
+    def arrays(self):
+        self._flush()
+        return [self.ends, array("B", self.text.encode("utf-8"))]
+
+
+class Dictionary(dict):
+    def __init__(self, column=None):
+        self.column = column or StringColumn()
+        self.strings = self.column.values()
+        super().__init__((value, idx) for idx, value in enumerate(self.strings))
+
+    def __missing__(self, value):
+        idx = self[value] = len(self.strings)
+        self.strings.append(value)
+        self.column.append(value)
+        return idx
+
+
+class LedgerIndex:
+    def __init__(self, formats, parse_formats):
+        self.formats = _format_key(formats)
+        self.parse_formats = list(parse_formats)
+        self.csv_size = 0
+        self.csv_mtime_ns = 0
+        self.sample_digest = bytes(16)
+        self.digest = bytes(16)
+        self.dates = Dictionary()
+        self.date_ordinals = array("i")
+        self.names = Dictionary()
+        self.ordinals = array("i")
+        self.amounts = array("q")
+        self.totals = array("q")
+        self.date_ids = array("I")
+        self.person_ids = array("I")
+        self.store_ids = array("I")
+        self.category_ids = array("I")
+        self.sub_ids = array("I")
+        self.expense_ids = StringColumn()
+        self.created_at = StringColumn()
+        self.offsets = array("Q")
+        self.order = None
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def _own_columns(self):
+        for name in (
+            "date_ordinals",
+            "ordinals",
+            "amounts",
+            "totals",
+            "date_ids",
+            "person_ids",
+            "store_ids",
+            "category_ids",
+            "sub_ids",
+            "offsets",
+        ):
+            setattr(self, name, _owned(getattr(self, name)))
+        for column in (self.dates.column, self.names.column, self.expense_ids, self.created_at):
+            column.ends = _owned(column.ends)
+
+    def extend(self, lines, offsets):
+        self._own_columns()
+        dates = self.dates
+        date_ordinals = self.date_ordinals
+        date_ids = [dates[line.date_text] for line in lines]
+        for date_id, line in zip(date_ids, lines):
+            if date_id == len(date_ordinals):
+                date_ordinals.append(line.date.toordinal() if line.date else 0)
+        names = self.names
+        self.date_ids.extend(date_ids)
+        self.ordinals.extend(map(date_ordinals.__getitem__, date_ids))
+        self.amounts.extend([line.amount_cents for line in lines])
+        self.totals.extend([line.total_cents for line in lines])
+        self.person_ids.extend([names[line.person] for line in lines])
+        self.store_ids.extend([names[line.store] for line in lines])
+        self.category_ids.extend([names[line.category] for line in lines])
+        self.sub_ids.extend([names[line.sub_category] for line in lines])
+        self.expense_ids.extend([line.expense_id for line in lines])
+        self.created_at.extend([line.created_at for line in lines])
+        self.offsets.extend(offsets)
+        self.order = None
+
+    def stamp(self, f, st):
+        self.csv_size = st.st_size
+        self.csv_mtime_ns = st.st_mtime_ns
+        self.sample_digest = _sample_digest(f, st.st_size)
+        self.digest = _file_digest(f, st.st_size)
+
+    def _dated_order(self):
+        if self.order is None:
+            ordinals = self.ordinals
+            dated = (pos for pos in range(len(ordinals)) if ordinals[pos])
+            self.order = array("I", sorted(dated, key=ordinals.__getitem__))
+        return self.order
+
+    def lines(self):
+        names = self.names.strings
+        texts = self.dates.strings
+        dates = [date.fromordinal(ordinal) if ordinal else None for ordinal in self.date_ordinals]
+        return [
+            ExpenseLine(dates[d], texts[d], names[p], names[s], total, names[c], names[u], amount, eid, created)
+            for d, p, s, total, c, u, amount, eid, created in zip(
+                self.date_ids,
+                self.person_ids,
+                self.store_ids,
+                self.totals,
+                self.category_ids,
+                self.sub_ids,
+                self.amounts,
+                self.expense_ids.values(),
+                self.created_at.values(),
+            )
+        ]
+
+    def line_at(self, pos):
+        names = self.names.strings
+        date_id = self.date_ids[pos]
+        ordinal = self.date_ordinals[date_id]
+        return ExpenseLine(
+            date.fromordinal(ordinal) if ordinal else None,
+            self.dates.strings[date_id],
+            names[self.person_ids[pos]],
+            names[self.store_ids[pos]],
+            self.totals[pos],
+            names[self.category_ids[pos]],
+            names[self.sub_ids[pos]],
+            self.amounts[pos],
+            self.expense_ids[pos],
+            self.created_at[pos],
+        )
+
+    def query(self, from_date=None, to_date=None, person=None):
+        order = self._dated_order()
+        ordinals = self.ordinals
+        lo = bisect_left(order, from_date.toordinal(), key=ordinals.__getitem__) if from_date else 0
+        hi = bisect_right(order, to_date.toordinal(), key=ordinals.__getitem__) if to_date else len(order)
+        positions = order[lo:hi]
+        if person is not None:
+            person_id = self.names.get(person)
+            if person_id is None:
+                return []
+            person_ids = self.person_ids
+            positions = [pos for pos in positions if person_ids[pos] == person_id]
+        return [self.line_at(pos) for pos in sorted(positions)]
+
+    def catch_up(self, f, st):
+        lines = []
+        offsets = array("Q")
+        for offset, values in read_records(f, self.csv_size):
+            lines.append(_values_to_line(values, self.parse_formats))
+            offsets.append(offset)
+        self.extend(lines, offsets)
+        self.stamp(f, st)
+
+    def _sections(self):
+        return [
+            _lines_section(self.formats),
+            _lines_section(self.parse_formats),
+            *self.dates.column.arrays(),
+            self.date_ordinals,
+            *self.names.column.arrays(),
+            self.ordinals,
+            self.amounts,
+            self.totals,
+            self.date_ids,
+            self.person_ids,
+            self.store_ids,
+            self.category_ids,
+            self.sub_ids,
+            *self.expense_ids.arrays(),
+            *self.created_at.arrays(),
+            self.offsets,
+            self._dated_order(),
+        ]
+
+    def write(self, f):
+        f.write(
+            HEADER.pack(
+                INDEX_MAGIC,
+                NATIVE_LITTLE,
+                INDEX_VERSION,
+                len(self),
+                self.csv_size,
+                self.csv_mtime_ns,
+                self.sample_digest,
+                self.digest,
+            )
+        )
+        for values in self._sections():
+            view = memoryview(values)
+            f.write(SECTION.pack(view.format.encode("ascii"), len(view)))
+            f.write(view)
+            f.write(bytes(-view.nbytes % SECTION_ALIGN))
+
+    def save(self, path):
+        try:
+            atomic_write(index_path_for(path), self.write, mode="wb")
+        except OSError:
+            pass
+
+
+class IndexedLines:
+    def __init__(self, index):
+        self.index = index
+        self.base = len(index)
+        self.cache = {}
+        self.tail = []
+
+    def __len__(self):
+        return self.base + len(self.tail)
+
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            return [self[p] for p in range(*pos.indices(len(self)))]
+        if pos < 0:
+            pos += len(self)
+        if pos >= self.base:
+            return self.tail[pos - self.base]
+        try:
+            return self.cache[pos]
+        except KeyError:
+            line = self.cache[pos] = self.index.line_at(pos)
+            return line
+
+    def __setitem__(self, pos, line):
+        if pos >= self.base:
+            self.tail[pos - self.base] = line
+        else:
+            self.cache[pos] = line
+
+    def __iter__(self):
+        return map(self.__getitem__, range(len(self)))
+
+    def extend(self, lines):
+        self.tail.extend(lines)
+
+    def _dropped(self):
+        return {pos for pos, line in self.cache.items() if line is None}
+
+    def materialize(self):
+        lines = self.index.lines()
+        for pos, line in self.cache.items():
+            lines[pos] = line
+        lines.extend(self.tail)
+        return lines
+
+    def dated_entries(self):
+        index = self.index
+        ordinals = index.ordinals
+        person_ids = index.person_ids
+        names = index.names.strings
+        dropped = self._dropped()
+        base = [
+            (ordinals[pos], pos, names[person_ids[pos]]) for pos in index._dated_order() if pos not in dropped
+        ]
+        tail = sorted(
+            (line.date.toordinal(), pos, line.person)
+            for pos, line in enumerate(self.tail, self.base)
+            if line and line.date
+        )
+        return list(merge(base, tail)) if tail else base
+
+    def expense_positions(self):
+        positions = {}
+        dropped = self._dropped()
+        for pos, expense_id in enumerate(self.index.expense_ids.values()):
+            if pos not in dropped:
+                positions.setdefault(expense_id, []).append(pos)
+        for pos, line in enumerate(self.tail, self.base):
+            if line is not None:
+                positions.setdefault(line.expense_id, []).append(pos)
+        return positions
+
+    def collisions(self, positions):
+        index = self.index
+        dropped = self._dropped()
+        keys = zip(index.expense_ids.values(), index.date_ids, index.person_ids, index.store_ids, index.totals)
+        if dropped:
+            keys = (key for pos, key in enumerate(keys) if pos not in dropped)
+        counts = Counter(key[0] for key in set(keys))
+        colliding = {expense_id for expense_id, count in counts.items() if count > 1}
+        for expense_id in {line.expense_id for line in self.tail if line is not None}:
+            if _shares_id(self[pos] for pos in positions[expense_id]):
+                colliding.add(expense_id)
+        return colliding
+
+    def day_cells(self):
+        index = self.index
+        columns = (index.ordinals, index.person_ids, index.store_ids, index.category_ids, index.sub_ids)
+        counts = Counter(zip(*columns))
+        sums = dict.fromkeys(counts, 0)
+        for key, cents in zip(zip(*columns), index.amounts):
+            sums[key] += cents
+        for pos in self._dropped():
+            key = tuple(column[pos] for column in columns)
+            counts[key] -= 1
+            sums[key] -= index.amounts[pos]
+        names = index.names.strings
+        for key, count in counts.items():
+            ordinal, person, store, category, sub_category = key
+            if ordinal and count > 0:
+                yield ordinal, (names[person], names[store], names[category], names[sub_category]), sums[key], count
+        for line in self.tail:
+            if line and line.date:
+                cell = (line.person, line.store, line.category, line.sub_category)
+                yield line.date.toordinal(), cell, line.amount_cents, 1
+
+
+def _lines_section(values):
+    return array("B", "".join(f"{value}\n" for value in values).encode("utf-8"))
+
+
+class SectionReader:
+    def __init__(self, mm):
+        self.view = memoryview(mm)
+        self.pos = HEADER.size
+
+    def section(self, typecode):
+        if self.pos + SECTION.size > len(self.view):
+            raise EOFError
+        stored, count = SECTION.unpack_from(self.view, self.pos)
+        if stored != typecode.encode("ascii"):
+            raise ValueError("unexpected section")
+        start = self.pos + SECTION.size
+        end = start + count * array(typecode).itemsize
+        if end > len(self.view):
+            raise EOFError
+        self.pos = end + -(end - start) % SECTION_ALIGN
+        return self.view[start:end].cast(typecode)
+
+    def strings(self):
+        ends = self.section("I")
+        return StringColumn(str(self.section("B"), "utf-8"), ends)
+
+    def lines(self):
+        return str(self.section("B"), "utf-8").splitlines()
+
+
+def read_index(path):
+    try:
+        with open(index_path_for(path), "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        magic, little, version, rows, csv_size, csv_mtime_ns, sample_digest, digest = HEADER.unpack_from(mm)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION or bool(little) != NATIVE_LITTLE:
+            return None
+        reader = SectionReader(mm)
+        index = LedgerIndex(reader.lines(), reader.lines())
+        index.dates = Dictionary(reader.strings())
+        index.date_ordinals = reader.section("i")
+        index.names = Dictionary(reader.strings())
+        index.ordinals = reader.section("i")
+        index.amounts = reader.section("q")
+        index.totals = reader.section("q")
+        index.date_ids = reader.section("I")
+        index.person_ids = reader.section("I")
+        index.store_ids = reader.section("I")
+        index.category_ids = reader.section("I")
+        index.sub_ids = reader.section("I")
+        index.expense_ids = reader.strings()
+        index.created_at = reader.strings()
+        index.offsets = reader.section("Q")
+        index.order = reader.section("I")
+    except (EOFError, ValueError, TypeError, UnicodeDecodeError, struct.error):
+        return None
+    if len(index) != rows:
+        return None
+    index.csv_size = csv_size
+    index.csv_mtime_ns = csv_mtime_ns
+    index.sample_digest = sample_digest
+    index.digest = digest
+    return index
+
+
+def open_index(path, formats):
+    index = read_index(path)
+    if index is None or index.formats != _format_key(formats):
+        return None
+    with open(path, "rb") as f:
+        st = os.fstat(f.fileno())
+        if st.st_size < index.csv_size or _sample_digest(f, index.csv_size) != index.sample_digest:
+            return None
+        if st.st_size == index.csv_size and st.st_mtime_ns == index.csv_mtime_ns:
+            return index
+        if st.st_size == index.csv_size:
+            return None
+        f.seek(index.csv_size - 1)
+        if index.csv_size and f.read(1) != b"\n":
+            return None
+        if _file_digest(f, index.csv_size) != index.digest:
+            return None
+        index.catch_up(f, st)
+    index.save(path)
+    return index
+
+
+def build_index(path, formats):
+    with open(path, "rb") as f:
+        st = os.fstat(f.fileno())
+        records = read_records(f)
+        next(records, None)
+        head = list(islice(records, DATE_SAMPLE_SIZE))
+        dominant = detect_date_format((values[0] for _offset, values in head), formats)
+        index = LedgerIndex(formats, prefer_format(formats, dominant))
+        lines = []
+        offsets = array("Q")
+        for offset, values in chain(head, records):
+            lines.append(_values_to_line(values, index.parse_formats))
+            offsets.append(offset)
+        index.extend(lines, offsets)
+        index.stamp(f, st)
+    return index, lines
+
+
+def index_written_lines(path, lines, formats, parse_formats):
+    offsets = record_offsets(path)
+    if len(offsets) != len(lines):
+        return None
+    index = LedgerIndex(formats, parse_formats)
+    index.extend(lines, offsets)
+    with open(path, "rb") as f:
+        index.stamp(f, os.fstat(f.fileno()))
+    return index
+
+
+def remove_index(path):
+    try:
+        os.remove(index_path_for(path))
+    except OSError:
+        pass
@@ -34,7 +34,8 @@ class ManagementMixin:
             self.people.append(p)
             save_json("people", self.people)
             self.person_cb["values"] = self.people
-            self.filter_person["values"] = ["All"] + self.people
+            if self.history_built:
+                self.filter_person["values"] = ["All"] + self.people
             self.set_status(f"Added person: {p}")
         self.new_person.delete(0, "end")
 
@@ -0,0 +1,179 @@
+import argparse
+import csv
+import json
+import sys
+from datetime import date
+from decimal import Decimal
+
+from analytics import (
+    PERIODS,
+    aggregate_by_bucket,
+    aggregate_by_bucket_in,
+    aggregate_pie,
+    aggregate_pie_in,
+    granularity_options,
+    period_range,
+)
+from csv_scan import scan
+from data_store import CSV_HEADERS, DATE_FORMATS, DEFAULT_DATA, EXPENSE_FILE, FILES, open_backend
+from utils import decimal_to_str, parse_date
+
+
+GROUPINGS = ["store", "person", "category", "subcategory"]
+GRANULARITIES = ["day", "week_monday", "week_rolling", "month"]
+
+
+def read_settings():
+    try:
+        with open(FILES["settings"], "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError):
+        return DEFAULT_DATA["settings"]
+
+
+def build_report(lines, start, end, person=None, grouping="category", granularity=None, backend=None):
+    dates = [line.date for line in lines if line.date]
+    if start is None or end is None:
+        if not dates:
+            return _empty_report(start, end, person, grouping, granularity)
+        start = start or min(dates)
+        end = end or max(dates)
+
+    range_days = (end - start).days + 1
+    options = granularity_options(range_days)
+    mode = granularity if granularity in options else options[0]
+    if backend is not None and backend.supports_aggregates:
+        buckets, labels, totals = aggregate_by_bucket_in(backend, start, end, mode, person)
+        pie_data = aggregate_pie_in(backend, start, end, grouping, person)
+    else:
+        buckets, labels, totals = aggregate_by_bucket(lines, start, end, mode)
+        pie_data = aggregate_pie(lines, start, end, grouping)
+    total = sum(totals, Decimal("0.00"))
+
+    return {
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "person": person,
+        "granularity": mode,
+        "grouping": grouping,
+        "records": len(lines),
+        "range_days": range_days,
+        "total": decimal_to_str(total),
+        "avg_per_day": decimal_to_str(total / Decimal(range_days)),
+        "buckets": [
+            {"label": label, "from": b_start.isoformat(), "to": b_end.isoformat(), "total": decimal_to_str(value)}
+            for (b_start, b_end), label, value in zip(buckets, labels, totals)
+        ],
+        "groups": [
+            {"group": key, "total": decimal_to_str(value)}
+            for key, value in sorted(pie_data.items(), key=lambda x: x[1], reverse=True)
+        ],
+    }
+
+
+def _empty_report(start, end, person, grouping, granularity):
+    return {
+        "from": start.isoformat() if start else None,
+        "to": end.isoformat() if end else None,
+        "person": person,
+        "granularity": granularity,
+        "grouping": grouping,
+        "records": 0,
+        "range_days": 0,
+        "total": "0.00",
+        "avg_per_day": "0.00",
+        "buckets": [],
+        "groups": [],
+    }
+
+
+def write_text(report, currency, out):
+    who = report["person"] or "all people"
+    out.write(f"Expenses {report['from']} - {report['to']} ({who})\n")
+    out.write(
+        f"Records: {report['records']} | Total: {report['total']} {currency} | "
+        f"Days: {report['range_days']} | Avg/day: {report['avg_per_day']} {currency}\n"
+    )
+    out.write(f"\nBy {report['granularity']}:\n")
+    for bucket in report["buckets"]:
+        out.write(f"  {bucket['label']:<16} {bucket['total']:>12}\n")
+    out.write(f"\nBy {report['grouping']}:\n")
+    for group in report["groups"]:
+        out.write(f"  {group['group']:<32} {group['total']:>12}\n")
+
+
+def write_csv(report, out):
+    writer = csv.writer(out)
+    writer.writerow(["section", "label", "from", "to", "total"])
+    for bucket in report["buckets"]:
+        writer.writerow([report["granularity"], bucket["label"], bucket["from"], bucket["to"], bucket["total"]])
+    for group in report["groups"]:
+        writer.writerow([report["grouping"], group["group"], report["from"], report["to"], group["total"]])
+    writer.writerow(["total", "", report["from"], report["to"], report["total"]])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print an expense summary without starting the GUI.")
+    parser.add_argument("--period", choices=PERIODS + ["all"], default="this month")
+    parser.add_argument("--from", dest="from_date", help="start date, overrides --period")
+    parser.add_argument("--to", dest="to_date", help="end date, overrides --period")
+    parser.add_argument("--person")
+    parser.add_argument("--grouping", choices=GROUPINGS, default="category")
+    parser.add_argument("--granularity", choices=GRANULARITIES)
+    parser.add_argument("--format", choices=["text", "json", "csv"], default="text")
+    parser.add_argument("--backend", choices=["csv", "sqlite"])
+    parser.add_argument("--csv", default=EXPENSE_FILE, help="ledger file for the csv backend")
+    parser.add_argument("--full-load", action="store_true", help="parse the whole csv ledger instead of scanning it")
+    args = parser.parse_args(argv)
+
+    settings = read_settings()
+    date_format = settings.get("date_format", DATE_FORMATS[0])
+    formats = [date_format] + [fmt for fmt in DATE_FORMATS if fmt != date_format]
+
+    start = end = None
+    if args.period != "all":
+        start, end = period_range(args.period, date.today())
+    for name in ("from_date", "to_date"):
+        raw = getattr(args, name)
+        if raw is None:
+            continue
+        parsed = parse_date(raw, formats)
+        if parsed is None:
+            parser.error(f"invalid date {raw!r}")
+        if name == "from_date":
+            start = parsed
+        else:
+            end = parsed
+    if start is not None and end is not None and start > end:
+        parser.error(f"start date {start.isoformat()} is after end date {end.isoformat()}")
+
+    kind = args.backend or settings.get("storage_backend", "csv")
+    if kind == "csv":
+        try:
+            with open(args.csv, newline="", encoding="utf-8") as f:
+                headers = next(csv.reader(f), [])
+        except OSError as exc:
+            parser.error(f"cannot read {args.csv}: {exc.strerror}")
+        except (UnicodeDecodeError, csv.Error):
+            headers = None
+        if headers != CSV_HEADERS:
+            parser.error(f"{args.csv} is not an expense ledger in the current layout; open it in the app once")
+    if kind == "csv" and not args.full_load:
+        lines = scan(args.csv, start, end, args.person, formats)
+        report = build_report(lines, start, end, args.person, args.grouping, args.granularity)
+    else:
+        backend = open_backend(kind, date_format, args.csv)
+        lines = backend.query(start, end, args.person)
+        report = build_report(lines, start, end, args.person, args.grouping, args.granularity, backend)
+
+    if args.format == "json":
+        json.dump(report, sys.stdout, indent=2, ensure_ascii=False)
+        sys.stdout.write("\n")
+    elif args.format == "csv":
+        write_csv(report, sys.stdout)
+    else:
+        write_text(report, settings.get("currency", "EUR"), sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import argparse
+import sqlite3
+import threading
+from datetime import date
+
+from data_store import DATA_DIR, EXPENSE_FILE, ExpenseBackend, ExpenseLine, Ledger
+
+
+SQLITE_FILE = f"{DATA_DIR}/expenses.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS expenses (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    date_ord INTEGER,
+    date_text TEXT NOT NULL,
+    person TEXT NOT NULL,
+    store TEXT NOT NULL,
+    total_cents INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    sub_category TEXT NOT NULL,
+    amount_cents INTEGER NOT NULL,
+    expense_id TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_expenses_date ON expenses (date_ord);
+CREATE INDEX IF NOT EXISTS idx_expenses_expense_id ON expenses (expense_id);
+CREATE INDEX IF NOT EXISTS idx_expenses_person_date ON expenses (person, date_ord);
+"""
+
+COLUMNS = (
+    "date_ord, date_text, person, store, total_cents, category, sub_category, amount_cents, expense_id, created_at"
+)
+
+GROUP_EXPRESSIONS = {
+    "store": "COALESCE(NULLIF(store, ''), 'Unknown')",
+    "person": "COALESCE(NULLIF(person, ''), 'Unknown')",
+    "category": "COALESCE(NULLIF(category, ''), 'Unknown')",
+    "subcategory": (
+        "COALESCE(NULLIF(category, ''), 'Unknown') || ' > ' || COALESCE(NULLIF(sub_category, ''), 'Unknown')"
+    ),
+}
+
+
+def _line_params(line):
+    return (
+        line.date.toordinal() if line.date else None,
+        line.date_text,
+        line.person,
+        line.store,
+        line.total_cents,
+        line.category,
+        line.sub_category,
+        line.amount_cents,
+        line.expense_id,
+        line.created_at,
+    )
+
+
+def _row_to_line(row):
+    date_ord, *rest = row
+    return ExpenseLine(date.fromordinal(date_ord) if date_ord else None, *rest)
+
+
+def _range_filter(from_date, to_date, person):
+    clauses = ["date_ord IS NOT NULL"]
+    params = []
+    if from_date:
+        clauses.append("date_ord >= ?")
+        params.append(from_date.toordinal())
+    if to_date:
+        clauses.append("date_ord <= ?")
+        params.append(to_date.toordinal())
+    if person is not None:
+        clauses.append("person = ?")
+        params.append(person)
+    return " AND ".join(clauses), params
+
+
+class SqliteLedger(ExpenseBackend):
+    supports_aggregates = True
+
+    def __init__(self, path, date_formats=None):
+        super().__init__(date_formats)
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _select(self, where="1", params=()):
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {COLUMNS} FROM expenses WHERE {where} ORDER BY seq", params)
+            return [_row_to_line(row) for row in rows]
+
+    def _insert(self, lines):
+        self._conn.executemany(
+            f"INSERT INTO expenses ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (_line_params(line) for line in lines),
+        )
+
+    def lines(self):
+        return self._select()
+
+    def query(self, from_date=None, to_date=None, person=None):
+        where, params = _range_filter(from_date, to_date, person)
+        return self._select(where, params)
+
+    def expense_lines(self, expense_id):
+        return self._select("expense_id = ?", (expense_id,))
+
+    def has_expense(self, expense_id):
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM expenses WHERE expense_id = ? LIMIT 1", (expense_id,)).fetchone()
+            return row is not None
+
+    def append(self, rows):
+        with self._lock, self._conn:
+            self._insert(self.to_line(row) for row in rows)
+
+    def replace_expense(self, expense_id, rows):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM expenses WHERE expense_id = ?", (expense_id,))
+            self._insert(self.to_line(row) for row in rows)
+
+    def delete_expense(self, expense_id):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM expenses WHERE expense_id = ?", (expense_id,))
+
+    def replace_all(self, rows):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM expenses")
+            self._insert(self.to_line(row) for row in rows)
+
+    def day_totals(self, from_date, to_date, person=None):
+        where, params = _range_filter(from_date, to_date, person)
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT date_ord, SUM(amount_cents) FROM expenses WHERE {where} GROUP BY date_ord ORDER BY date_ord",
+                params,
+            ).fetchall()
+
+    def group_totals(self, from_date, to_date, grouping, person=None):
+        expression = GROUP_EXPRESSIONS.get(grouping, "'Unknown'")
+        where, params = _range_filter(from_date, to_date, person)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {expression} AS grp, SUM(amount_cents) FROM expenses WHERE {where} "
+                "GROUP BY grp ORDER BY MIN(seq)",
+                params,
+            ).fetchall()
+        return dict(rows)
+
+    def import_csv(self, csv_path):
+        self.replace_all(Ledger(csv_path, self.date_formats).lines())
+
+    def export_csv(self, csv_path):
+        lines = self.lines()
+        Ledger(csv_path, self.date_formats).replace_all(lines)
+        return len(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Move the expense ledger between CSV and SQLite.")
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("--csv", default=EXPENSE_FILE)
+    parser.add_argument("--db", default=SQLITE_FILE)
+    args = parser.parse_args(argv)
+
+    backend = SqliteLedger(args.db)
+    try:
+        if args.action == "import":
+            backend.import_csv(args.csv)
+            print(f"Imported {len(backend.lines())} lines from {args.csv} into {args.db}")
+        else:
+            count = backend.export_csv(args.csv)
+            print(f"Exported {count} lines from {args.db} to {args.csv}")
+    finally:
+        backend.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import data_store
+
+
+def _row(expense_id, store, amount):
+    return {
+        "date": "01.02.2024",
+        "person": "Ana",
+        "store": store,
+        "total": amount,
+        "category": "Food",
+        "sub_category": "",
+        "amount": amount,
+        "expense_id": expense_id,
+        "created_at": "2024-02-01T10:00:00",
+    }
+
+
+def test_journal_cut_inside_multibyte_character(tmp_path):
+    path = str(tmp_path / "expenses.csv")
+    data_store.ensure_expense_file(path)
+    ledger = data_store.Ledger(path)
+    ledger.append([_row("aaaa0001", "Market", "10.00")])
+
+    record = {"op": "upsert", "expense_id": "aaaa0002", "rows": [list(_row("aaaa0002", "Café", "5.00").values())]}
+    payload = json.dumps(record, ensure_ascii=False).encode("utf-8")
+    with open(ledger.journal_path, "ab") as f:
+        f.write(payload[:payload.index("é".encode("utf-8")) + 1])
+
+    reloaded = data_store.Ledger(path)
+    assert [line.expense_id for line in reloaded.lines()] == ["aaaa0001"]
+
+    reloaded.append([_row("aaaa0003", "Bäckerei", "3.00")])
+    stores = [line.store for line in data_store.Ledger(path).lines()]
+    assert stores == ["Market", "Bäckerei"]
@@ -0,0 +1,36 @@
+import csv
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import data_store
+import ledger_index
+
+
+def _write_rows(path, count):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(data_store.CSV_HEADERS)
+        for n in range(count):
+            writer.writerow(["01.02.2024", "Ana", f"Store {n}", "1.00", "Food", "", "1.00", f"{n:08x}", ""])
+
+
+def test_edit_before_append_invalidates_index(tmp_path):
+    path = str(tmp_path / "expenses.csv")
+    _write_rows(path, 10000)
+    assert data_store.Ledger(path).line_count() == 10000
+    assert os.path.getsize(path) > 2 * ledger_index.SAMPLE_BYTES
+
+    with open(path, "rb") as f:
+        data = f.read()
+    middle = data.index(b"Store 5000,1.00")
+    with open(path, "wb") as f:
+        f.write(data[:middle] + b"Store 5000,7.00" + data[middle + len(b"Store 5000,1.00"):])
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerow(["02.02.2024", "Ana", "Late", "1.00", "Food", "", "1.00", "ffffffff", ""])
+
+    assert ledger_index.open_index(path, data_store.DATE_FORMATS) is None
+    ledger = data_store.Ledger(path)
+    assert ledger.line_count() == 10001
+    assert sum(line.total_cents for line in ledger.lines()) == 10001 * 100 + 600
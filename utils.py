@@ -1,5 +1,7 @@
-from datetime import datetime
+import re
+from datetime import date, datetime
 from decimal import Decimal
+from functools import lru_cache
 
 
 def parse_decimal(value):
@@ -12,11 +14,85 @@ def decimal_to_str(value):
     return f"{value:.2f}"
 
 
-def parse_date(date_str, formats):
-    raw = str(date_str).strip()
-    for fmt in formats:
+def parse_cents(value):
+    return int(parse_decimal(value) * 100)
+
+
+def cents_to_decimal(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+def cents_to_str(cents):
+    return decimal_to_str(cents_to_decimal(cents))
+
+
+_DAY = r"(3[01]|[12]\d|0[1-9]|[1-9]| [1-9])"
+_MONTH = r"(1[0-2]|0[1-9]|[1-9])"
+_YEAR = r"(\d\d\d\d)"
+
+_FAST_FORMATS = {
+    "%d.%m.%Y": (re.compile(rf"{_DAY}\.{_MONTH}\.{_YEAR}"), (2, 1, 0)),
+    "%Y-%m-%d": (re.compile(rf"{_YEAR}-{_MONTH}-{_DAY}"), (0, 1, 2)),
+    "%m/%d/%Y": (re.compile(rf"{_MONTH}/{_DAY}/{_YEAR}"), (2, 0, 1)),
+}
+_NUMERIC_FORMAT = re.compile(r"%[dmY]([^%\w])%[dmY]\1%[dmY]")
+
+
+def _parse_with(raw, fmt):
+    fast = _FAST_FORMATS.get(fmt)
+    if fast is None:
         try:
             return datetime.strptime(raw, fmt).date()
         except ValueError:
-            continue
+            return None
+    pattern, (year, month, day) = fast
+    match = pattern.fullmatch(raw)
+    if match is None:
+        return None
+    groups = match.groups()
+    try:
+        return date(int(groups[year]), int(groups[month]), int(groups[day]))
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=16384)
+def _parse_date_cached(raw, formats):
+    for fmt in formats:
+        parsed = _parse_with(raw, fmt)
+        if parsed is not None:
+            return parsed
     return None
+
+
+def parse_date(date_str, formats):
+    return _parse_date_cached(str(date_str).strip(), tuple(formats))
+
+
+def detect_date_format(values, formats):
+    counts = {}
+    for value in values:
+        raw = str(value).strip()
+        for fmt in formats:
+            if _parse_with(raw, fmt) is not None:
+                counts[fmt] = counts.get(fmt, 0) + 1
+                break
+    if not counts:
+        return None
+    return max(counts, key=counts.get)
+
+
+def _separator(fmt):
+    match = _NUMERIC_FORMAT.fullmatch(fmt)
+    return match.group(1) if match else None
+
+
+def prefer_format(formats, preferred):
+    ordered = list(dict.fromkeys(formats))
+    if preferred not in ordered:
+        return ordered
+    separator = _separator(preferred)
+    ahead = ordered[: ordered.index(preferred)]
+    if separator is None or any(_separator(fmt) in (None, separator) for fmt in ahead):
+        return ordered
+    return [preferred] + [fmt for fmt in ordered if fmt != preferred]